@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    value: Any
+    etag: str
+    size: int
+
+
+class ResultCache:
+    # In-process LRU bounded by entry count and by approximate payload bytes.
+    # Keys embed a ledger watermark, so a ledger write makes old entries unreachable
+    # and they age out through normal LRU eviction.
+
+    def __init__(self, name: str, max_entries: int, max_bytes: int):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, CacheEntry] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple) -> CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, value: Any, size: int, etag: str | None = None) -> CacheEntry:
+        entry = CacheEntry(value=value, etag=etag or "", size=size)
+        if size > self.max_bytes:
+            return entry
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = entry
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+_ENTITY_TAG = re.compile(r'(?:W/)?"[^"]*"')
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match evaluation (RFC 9110 13.1.2): "*", or any tag in the list equal to
+    `etag` under weak comparison (W/ prefixes ignored)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = etag.removeprefix("W/")
+    return any(tag.removeprefix("W/") == target for tag in _ENTITY_TAG.findall(if_none_match))
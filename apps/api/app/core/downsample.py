@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from typing import Sequence, TypeVar
+
+T = TypeVar("T")
+
+
+def lttb(points: Sequence[T], threshold: int, x=lambda p: p[0], y=lambda p: p[1]) -> list[T]:
+    """Largest-Triangle-Three-Buckets downsampling to at most ``threshold`` points.
+
+    Keeps the first and last points; from each interior bucket keeps the point forming the
+    largest triangle with the previously kept point and the next bucket's mean, which
+    preserves peaks and troughs far better than striding or averaging.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    out = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        nxt_start, nxt_end = end, min(int((i + 2) * every) + 1, n)
+        nxt = points[nxt_start:nxt_end]
+        avg_x = sum(x(p) for p in nxt) / len(nxt)
+        avg_y = sum(y(p) for p in nxt) / len(nxt)
+
+        ax, ay = x(points[a]), y(points[a])
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (y(points[j]) - ay) - (ax - x(points[j])) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        out.append(points[best])
+        a = best
+    out.append(points[-1])
+    return out
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import bisect
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Minimal Prometheus text-format registry. The API only needs counters, gauges and
+# fixed-bucket histograms, so this avoids a client library dependency.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, v in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_fmt(v)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (non-cumulative, last slot is +Inf), sum, count]
+        self._series: dict[tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._series.items())
+        for labels, (counts, total, n) in items:
+            cumulative = 0
+            for le, c in zip((*self.buckets, float("inf")), counts):
+                cumulative += c
+                le_label = f'le="{_fmt(le)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le_label)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_fmt(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {n}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: list = []
+        self._collectors: list[Callable[[], Iterable[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn: Callable[[], Iterable[str]]) -> None:
+        # Collectors render point-in-time gauges (pool state, cache size) at scrape time.
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        for fn in self._collectors:
+            lines.extend(fn())
+        return "\n".join(lines) + "\n"
+
+
+def gauge_lines(name: str, help: str, samples: Iterable[tuple[dict, float]], kind: str = "gauge") -> list[str]:
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, v in samples:
+        names = tuple(labels)
+        lines.append(f"{name}{_labels(names, tuple(str(labels[n]) for n in names))} {_fmt(v)}")
+    return lines
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+)
+SQL_QUERY_SECONDS = REGISTRY.register(
+    Histogram("sql_query_duration_seconds", "SQL statement latency by calling service.", ("service", "operation"))
+)
+SQL_QUERY_ROWS = REGISTRY.register(
+    Histogram(
+        "sql_query_rows", "Rows returned/affected per SQL statement.", ("service", "operation"), buckets=ROW_BUCKETS
+    )
+)
+SQL_QUERY_ERRORS = REGISTRY.register(
+    Counter("sql_query_errors_total", "SQL statements that raised, by calling service.", ("service", "operation"))
+)
+SERVICE_CALL_SECONDS = REGISTRY.register(
+    Histogram("service_call_duration_seconds", "Service function latency, SQL included.", ("service",))
+)
+
+_current_service: contextvars.ContextVar[str] = contextvars.ContextVar("current_service", default="other")
+
+
+def traced(name: str):
+    """Label SQL issued inside the decorated service function with ``name``."""
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                token = _current_service.set(name)
+                t0 = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    SERVICE_CALL_SECONDS.observe(time.perf_counter() - t0, name)
+                    _current_service.reset(token)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            token = _current_service.set(name)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                SERVICE_CALL_SECONDS.observe(time.perf_counter() - t0, name)
+                _current_service.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip().split(None, 1)
+    return head[0].upper() if head else ""
+
+
+def instrument_engine(engine: Engine) -> None:
+    # Cursor-level timing: one observation per statement actually sent to the driver,
+    # attributed to whichever traced service is on the current context.
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        service = _current_service.get()
+        op = _operation(statement)
+        SQL_QUERY_SECONDS.observe(elapsed, service, op)
+        # rowcount is the result size for buffered SELECTs and the affected count for
+        # DML; server-side (streaming) cursors report -1 and are skipped.
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            SQL_QUERY_ROWS.observe(cursor.rowcount, service, op)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(ctx):
+        starts = ctx.connection.info.get("query_start") if ctx.connection is not None else None
+        if starts:
+            starts.pop()
+        SQL_QUERY_ERRORS.inc(_current_service.get(), _operation(ctx.statement or ""))
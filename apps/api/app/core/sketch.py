@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Iterable
+
+
+@dataclass
+class HeavyHitterSketch:
+    """Bounded top-K summary with deterministic error bounds (weighted Space-Saving style).
+
+    Each tracked key carries a lower and an upper bound on its true weight. ``floor``
+    bounds the weight of any key that is *not* tracked. Sketches merge by adding bounds,
+    so summaries kept per day (or month) combine into a summary for any window, still
+    holding at most ``capacity`` counters.
+    """
+
+    capacity: int
+    floor: float = 0.0
+    total: float = 0.0
+    # key -> [lower, upper, n]; n is the activity count seen while tracked (a lower bound).
+    counters: dict[str, list] = field(default_factory=dict)
+
+    @classmethod
+    def from_weights(cls, weights: Iterable[tuple[str, float, int]], capacity: int, total: float) -> HeavyHitterSketch:
+        # Exact per-key weights (e.g. one day of the rollup): keep the heaviest keys
+        # exactly; the heaviest dropped key bounds everything that was dropped.
+        ranked = sorted(weights, key=lambda x: x[1], reverse=True)
+        kept, dropped = ranked[:capacity], ranked[capacity:]
+        return cls(
+            capacity=capacity,
+            floor=float(dropped[0][1]) if dropped else 0.0,
+            total=float(total),
+            counters={k: [float(w), float(w), int(n)] for k, w, n in kept},
+        )
+
+    @classmethod
+    def merge(cls, sketches: Iterable[HeavyHitterSketch], capacity: int) -> HeavyHitterSketch:
+        sketches = list(sketches)
+        floor_sum = sum(s.floor for s in sketches)
+        acc: dict[str, list] = {}
+        for s in sketches:
+            for k, (lo, hi, n) in s.counters.items():
+                a = acc.get(k)
+                if a is None:
+                    a = acc[k] = [0.0, 0.0, 0]
+                a[0] += lo
+                # A sketch that does not track k still allows up to its floor; adding
+                # (hi - floor) here and floor_sum below counts every sketch exactly once.
+                a[1] += hi - s.floor
+                a[2] += n
+        for a in acc.values():
+            a[1] += floor_sum
+
+        ranked = sorted(acc.items(), key=lambda kv: kv[1][1], reverse=True)
+        kept, dropped = ranked[:capacity], ranked[capacity:]
+        floor = max([floor_sum] + [a[1] for _, a in dropped[:1]])
+        return cls(
+            capacity=capacity,
+            floor=floor,
+            total=sum(s.total for s in sketches),
+            counters=dict(kept),
+        )
+
+    def top(self, k: int) -> list[tuple[str, float, float, int]]:
+        """(key, lower, upper, n) for the k keys with the largest upper bound."""
+        ranked = sorted(self.counters.items(), key=lambda kv: (-kv[1][1], kv[0]))[:k]
+        return [(key, lo, hi, n) for key, (lo, hi, n) in ranked]
+
+    def estimate(self, key: str) -> tuple[float, float]:
+        c = self.counters.get(key)
+        return (c[0], c[1]) if c is not None else (0.0, self.floor)
+
+    def to_json(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "floor": self.floor,
+            "total": self.total,
+            "items": [[k, lo, hi, n] for k, (lo, hi, n) in self.counters.items()],
+        }
+
+    @classmethod
+    def from_json(cls, d: dict) -> HeavyHitterSketch:
+        return cls(
+            capacity=int(d["capacity"]),
+            floor=float(d["floor"]),
+            total=float(d["total"]),
+            counters={k: [lo, hi, n] for k, lo, hi, n in d["items"]},
+        )
@@ -1,10 +1,70 @@
 from __future__ import annotations
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.db.pool import PoolStats, instrumented_pool
+
+
+def _engine_options(pool_class: type[QueuePool], stats: PoolStats) -> dict:
+    return {
+        "pool_pre_ping": True,
+        "poolclass": instrumented_pool(pool_class, stats),
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+
+class RequestSession(Session):
+    """Session used for API requests (run_db, exports); see _request_statement_timeout."""
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
+
+@event.listens_for(RequestSession, "after_begin")
+def _request_statement_timeout(session, transaction, connection) -> None:
+    # Server-side guard for request work only: a runaway aggregate is cancelled instead
+    # of holding a pooled connection indefinitely. SET LOCAL scopes it to the
+    # transaction, so the connection goes back to the pool without it and init_db,
+    # the background workers and scripts (DDL, backfills, full rebuilds) run unbounded.
+    if connection.dialect.name == "postgresql" and settings.db_statement_timeout_ms > 0:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.db_statement_timeout_ms)}")
+
+
+pool_stats = PoolStats()
+engine = create_engine(settings.database_url, **_engine_options(QueuePool, pool_stats))
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+RequestSessionLocal = sessionmaker(bind=engine, class_=RequestSession, autoflush=False, autocommit=False)
+instrument_engine(engine)
+
+# The async path reuses the same URL: postgresql+psycopg selects psycopg's async
+# connection under create_async_engine. It is not a Settings field: it has not beaten
+# the threadpool in scripts/bench_api_concurrency.py yet, so only that script turns it
+# on (API_BENCH_ASYNC_DB=1). Sync deployments never build the async engine.
+ASYNC_DB_ENABLED = os.environ.get("API_BENCH_ASYNC_DB", "").lower() in {"1", "true"}
+async_pool_stats = PoolStats()
+async_engine = (
+    create_async_engine(settings.database_url, **_engine_options(AsyncAdaptedQueuePool, async_pool_stats))
+    if ASYNC_DB_ENABLED
+    else None
+)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine)
+AsyncSessionLocal = (
+    async_sessionmaker(bind=async_engine, sync_session_class=RequestSession, autoflush=False, expire_on_commit=False)
+    if async_engine is not None
+    else None
+)
+
 
+def pool_status() -> dict:
+    out = {"sync": pool_stats.snapshot(engine.pool)}
+    if async_engine is not None:
+        out["async"] = async_pool_stats.snapshot(async_engine.sync_engine.pool)
+    return out
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+# Ledger writes mark the (dimension, key) pairs they touch in hotspot_dirty_keys and the
+# days they touch in sketch_dirty_days, so the hotspot refresher only recomputes those
+# keys and day sketches instead of whole windows. Same statement-level, transition-table
+# pattern as the rollup and watermark triggers.
+
+_DIRTY_FROM = """
+        INSERT INTO hotspot_dirty_keys (dimension, key)
+        SELECT DISTINCT d.dimension, d.key
+        FROM {rows} AS t
+        CROSS JOIN LATERAL (
+            VALUES ('supplier', t.supplier_id), ('lane', t.lane_id), ('sku', t.sku), ('facility', t.facility_id)
+        ) AS d (dimension, key)
+        WHERE d.key IS NOT NULL
+        ON CONFLICT DO NOTHING;
+        INSERT INTO sketch_dirty_days (period_date)
+        SELECT DISTINCT period_date FROM {rows}
+        ON CONFLICT DO NOTHING;
+"""
+
+_DIRTY_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION hotspot_mark_dirty() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        {_DIRTY_FROM.format(rows="old_rows")}
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        {_DIRTY_FROM.format(rows="new_rows")}
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS hotspot_dirty_ins ON carbon_ledger",
+    "DROP TRIGGER IF EXISTS hotspot_dirty_upd ON carbon_ledger",
+    "DROP TRIGGER IF EXISTS hotspot_dirty_del ON carbon_ledger",
+    """CREATE TRIGGER hotspot_dirty_ins AFTER INSERT ON carbon_ledger
+       REFERENCING NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION hotspot_mark_dirty()""",
+    """CREATE TRIGGER hotspot_dirty_upd AFTER UPDATE ON carbon_ledger
+       REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION hotspot_mark_dirty()""",
+    """CREATE TRIGGER hotspot_dirty_del AFTER DELETE ON carbon_ledger
+       REFERENCING OLD TABLE AS old_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION hotspot_mark_dirty()""",
+]
+
+
+def migrate_hotspot_aggregates(conn: Connection) -> None:
+    # hotspot_aggregates predates window_key and was never written, so an old-shape
+    # table is simply dropped and recreated by create_all.
+    insp = inspect(conn)
+    if not insp.has_table("hotspot_aggregates"):
+        return
+    if "window_key" not in {c["name"] for c in insp.get_columns("hotspot_aggregates")}:
+        conn.execute(text("DROP TABLE hotspot_aggregates"))
+
+
+def install_hotspot_tracking(conn: Connection) -> None:
+    if conn.dialect.name != "postgresql":
+        return
+    conn.execute(text("LOCK TABLE carbon_ledger IN SHARE ROW EXCLUSIVE MODE"))
+    conn.execute(text(_DIRTY_FUNCTION))
+    for stmt in _TRIGGERS:
+        conn.execute(text(stmt))
+
+
+def mark_dirty_from(conn: Connection, table: str) -> None:
+    # Mark everything in `table` dirty, as the triggers would for rows that leave the
+    # ledger without DML (a detached partition).
+    for stmt in _DIRTY_FROM.format(rows=table).split(";"):
+        if stmt.strip():
+            conn.execute(text(stmt))
+
+
+def hotspot_tracking_installed(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(
+        conn.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_trigger "
+                "WHERE tgname = 'hotspot_dirty_ins' AND tgrelid = to_regclass('carbon_ledger'))"
+            )
+        ).scalar_one()
+    )
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.db.models import CarbonLedgerLine
+
+# carbon_ledger used to carry a single-column index on nearly every column. The service
+# queries filter a period_date range and group by one dimension, reading only kg_co2e,
+# so those indexes were rarely chosen while still costing every pipeline write. The
+# model now declares composite, covering indexes instead (see app.db.models); this
+# module brings existing databases in line with it. Fresh databases get the new set
+# from create_all.
+
+# Single-column indexes the composites make redundant, with the column each one covered
+# (kept so scripts/explain_ledger_indexes.py can reproduce the old layout).
+LEGACY_LEDGER_INDEXES = {
+    "ix_carbon_ledger_activity_type": "activity_type",
+    "ix_carbon_ledger_scope": "scope",
+    "ix_carbon_ledger_category": "category",
+    "ix_carbon_ledger_computed_at": "computed_at",
+    "ix_carbon_ledger_period_date": "period_date",
+    "ix_carbon_ledger_supplier_id": "supplier_id",
+    "ix_carbon_ledger_lane_id": "lane_id",
+    "ix_carbon_ledger_sku": "sku",
+    "ix_carbon_ledger_facility_id": "facility_id",
+    # Superseded by idx_ledger_period_scope_cat_cov, which also covers the summary measures.
+    "idx_ledger_period_scope_cat": "period_date, scope, category",
+}
+
+# Earlier composites replaced under a new name when their INCLUDE list grew (the
+# drill-down ones now also cover activity_id/activity_type); dropped, never restored.
+SUPERSEDED_LEDGER_INDEXES = (
+    "idx_ledger_supplier_id_period",
+    "idx_ledger_lane_id_period",
+    "idx_ledger_sku_period",
+    "idx_ledger_facility_id_period",
+)
+
+
+def _ledger_index_names(conn: Connection) -> set[str]:
+    return set(
+        conn.execute(
+            text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = 'carbon_ledger'")
+        ).scalars()
+    )
+
+
+def migrate_ledger_indexes(conn: Connection) -> dict[str, list[str]]:
+    """Create the model's missing ledger indexes, then drop the legacy single-column ones.
+
+    Plain CREATE INDEX (CONCURRENTLY can't run in a transaction or on a partitioned
+    table) blocks ledger writes while it builds; on a large ledger, run it in a quiet
+    window via scripts/explain_ledger_indexes.py --apply.
+    """
+    if conn.dialect.name != "postgresql":
+        return {"created": [], "dropped": []}
+    existing = _ledger_index_names(conn)
+    created = []
+    for index in sorted(CarbonLedgerLine.__table__.indexes, key=lambda i: i.name):
+        if index.name not in existing:
+            index.create(conn)
+            created.append(index.name)
+    dropped = sorted(name for name in (*LEGACY_LEDGER_INDEXES, *SUPERSEDED_LEDGER_INDEXES) if name in existing)
+    for name in dropped:
+        conn.execute(text(f'DROP INDEX "{name}"'))
+    return {"created": created, "dropped": dropped}
+
+
+def restore_legacy_ledger_indexes(conn: Connection) -> None:
+    # Only for before/after comparisons: recreate the old layout (and drop the new one).
+    existing = _ledger_index_names(conn)
+    kept = {"ix_carbon_ledger_activity_id"}
+    model = {index.name for index in CarbonLedgerLine.__table__.indexes}
+    for name in sorted((model | set(SUPERSEDED_LEDGER_INDEXES)) & existing - kept):
+        conn.execute(text(f'DROP INDEX "{name}"'))
+    for name, column in LEGACY_LEDGER_INDEXES.items():
+        conn.execute(text(f'CREATE INDEX IF NOT EXISTS "{name}" ON carbon_ledger ({column})'))
@@ -8,7 +8,13 @@ from sqlalchemy import delete, select
 
 from app.core.config import settings
 from app.db.engine import SessionLocal, engine
+from app.db.hotspots import install_hotspot_tracking, migrate_hotspot_aggregates
+from app.db.indexes import migrate_ledger_indexes
 from app.db.models import Base, EmissionFactor, Supplier
+from app.db.partitions import install_partitioned_ledger
+from app.db.payloads import drop_payload_interning, migrate_ledger_payload_columns
+from app.db.rollup import install_rollup
+from app.db.watermarks import install_watermarks
 
 
 def _parse_dt(s: str) -> dt.datetime:
@@ -19,7 +25,20 @@ def _parse_dt(s: str) -> dt.datetime:
 
 
 def init_db(load_seed: bool = True) -> None:
+    with engine.begin() as conn:
+        migrate_hotspot_aggregates(conn)
+        migrate_ledger_payload_columns(conn)
+        if settings.ledger_partitioned:
+            install_partitioned_ledger(conn, settings.ledger_partition_months_ahead)
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        migrate_ledger_indexes(conn)
+        install_watermarks(conn)
+        install_hotspot_tracking(conn)
+        drop_payload_interning(conn)
+    if settings.ledger_rollup_enabled:
+        with engine.begin() as conn:
+            install_rollup(conn)
     if not load_seed:
         return
 
@@ -62,5 +81,14 @@ def init_db(load_seed: bool = True) -> None:
 
 def reset_db() -> None:
     Base.metadata.drop_all(bind=engine)
+    if settings.ledger_partitioned:
+        with engine.begin() as conn:
+            install_partitioned_ledger(conn, settings.ledger_partition_months_ahead)
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        install_watermarks(conn)
+        install_hotspot_tracking(conn)
+    if settings.ledger_rollup_enabled:
+        with engine.begin() as conn:
+            install_rollup(conn)
 
@@ -3,7 +3,7 @@ from __future__ import annotations
 import datetime as dt
 import uuid
 
-from sqlalchemy import Boolean, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text, func
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
@@ -80,9 +80,9 @@ class CarbonLedgerLine(Base):
 
     ledger_id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     activity_id: Mapped[str] = mapped_column(String, index=True)
-    activity_type: Mapped[str] = mapped_column(String, index=True)  # shipment | purchased_goods | electricity_bill
-    scope: Mapped[int] = mapped_column(Integer, index=True)
-    category: Mapped[str] = mapped_column(String, index=True)  # transport | purchased_goods | electricity
+    activity_type: Mapped[str] = mapped_column(String)  # shipment | purchased_goods | electricity_bill
+    scope: Mapped[int] = mapped_column(Integer)
+    category: Mapped[str] = mapped_column(String)  # transport | purchased_goods | electricity
 
     kg_co2e: Mapped[float] = mapped_column(Float)
     method: Mapped[str] = mapped_column(String)  # activity_factor | supplier_intensity | fallback_proxy | ml_estimate_placeholder
@@ -92,20 +92,79 @@ class CarbonLedgerLine(Base):
     factor_version: Mapped[str | None] = mapped_column(String, nullable=True)
 
     lineage_json: Mapped[dict] = mapped_column(JSONB)
-    assumptions_json: Mapped[dict] = mapped_column(JSONB)
+    # Written inline; settled months can be compacted into ledger_payloads (see
+    # app.db.payloads), leaving only assumptions_id with assumptions_json NULL. Read
+    # through app.db.payloads.ledger_assumptions().
+    assumptions_json: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    assumptions_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
-    computed_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), index=True)
-    period_date: Mapped[dt.date] = mapped_column(Date, index=True)
+    computed_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True))
+    period_date: Mapped[dt.date] = mapped_column(Date)
 
-    supplier_id: Mapped[str | None] = mapped_column(ForeignKey("suppliers.supplier_id"), nullable=True, index=True)
-    lane_id: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
-    sku: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
-    facility_id: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    supplier_id: Mapped[str | None] = mapped_column(ForeignKey("suppliers.supplier_id"), nullable=True)
+    lane_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    sku: Mapped[str | None] = mapped_column(String, nullable=True)
+    facility_id: Mapped[str | None] = mapped_column(String, nullable=True)
+
+
+class LedgerPayload(Base):
+    # Content-addressed ledger documents (assumptions), shared by every row that carries
+    # the same one. Rows are immutable: a changed document gets a new payload.
+    __tablename__ = "ledger_payloads"
+
+    payload_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    payload_hash: Mapped[str] = mapped_column(String, unique=True)  # md5 of the jsonb text
+    payload: Mapped[dict] = mapped_column(JSONB)
+
+
+class CarbonDailyRollup(Base):
+    # Daily fact table over carbon_ledger, maintained by triggers (see app.db.rollup).
+    __tablename__ = "carbon_daily_rollup"
+
+    rollup_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    period_date: Mapped[dt.date] = mapped_column(Date)
+    scope: Mapped[int] = mapped_column(Integer)
+    category: Mapped[str] = mapped_column(String)
+    activity_type: Mapped[str] = mapped_column(String)
+
+    supplier_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    lane_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    sku: Mapped[str | None] = mapped_column(String, nullable=True)
+    facility_id: Mapped[str | None] = mapped_column(String, nullable=True)
+
+    kg_co2e_sum: Mapped[float] = mapped_column(Float)
+    activity_count: Mapped[int] = mapped_column(BigInteger)
+    confidence_sum: Mapped[float] = mapped_column(Float)
+    last_computed_at: Mapped[dt.datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class IngestWatermark(Base):
+    # Per-stream freshness, maintained by triggers on the tables the worker writes (see app.db.watermarks).
+    __tablename__ = "ingest_watermarks"
+
+    source: Mapped[str] = mapped_column(String, primary_key=True)  # shipments | suppliers | electricity_bills
+    last_event_time: Mapped[dt.datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_computed_at: Mapped[dt.datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    ingest_lag_seconds: Mapped[float | None] = mapped_column(Float, nullable=True)
+    rows_written: Mapped[int] = mapped_column(BigInteger, default=0)
+    change_seq: Mapped[int] = mapped_column(BigInteger, default=0)
+    updated_at: Mapped[dt.datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class LedgerMonthWatermark(Base):
+    # Per-month ledger change counter, maintained by triggers (see app.db.watermarks).
+    __tablename__ = "ledger_month_watermarks"
+
+    month: Mapped[dt.date] = mapped_column(Date, primary_key=True)
+    change_seq: Mapped[int] = mapped_column(BigInteger, default=0)
+    updated_at: Mapped[dt.datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
 
 class HotspotAggregate(Base):
+    # Maintained per standard window by the hotspot refresher (see app.services.hotspot_refresh).
     __tablename__ = "hotspot_aggregates"
 
+    window_key: Mapped[str] = mapped_column(String, primary_key=True)  # 7d | 30d | 90d | fy
     hotspot_id: Mapped[str] = mapped_column(String, primary_key=True)  # e.g. supplier:SUP_..., lane:LANE_...
     dimension: Mapped[str] = mapped_column(String, index=True)  # supplier|lane|sku|facility
     key: Mapped[str] = mapped_column(String, index=True)
@@ -121,6 +180,45 @@ class HotspotAggregate(Base):
     explanation: Mapped[str] = mapped_column(Text)
 
 
+class HotspotWindowState(Base):
+    # Bounds and ledger watermark each hotspot window was last refreshed at.
+    __tablename__ = "hotspot_window_state"
+
+    window_key: Mapped[str] = mapped_column(String, primary_key=True)
+    period_from: Mapped[dt.date] = mapped_column(Date)
+    period_to: Mapped[dt.date] = mapped_column(Date)
+    total_kg_co2e: Mapped[float] = mapped_column(Float)
+    ledger_watermark: Mapped[str] = mapped_column(String)
+    refreshed_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True))
+
+
+class HotspotDirtyKey(Base):
+    # Dimension keys touched by ledger writes since the last refresh, recorded by trigger (see app.db.hotspots).
+    __tablename__ = "hotspot_dirty_keys"
+
+    dimension: Mapped[str] = mapped_column(String, primary_key=True)
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+
+
+class HotspotSketch(Base):
+    # Per-day and per-month heavy-hitter sketches per dimension (see app.core.sketch).
+    __tablename__ = "hotspot_sketches"
+
+    grain: Mapped[str] = mapped_column(String, primary_key=True)  # day | month
+    period_start: Mapped[dt.date] = mapped_column(Date, primary_key=True)
+    dimension: Mapped[str] = mapped_column(String, primary_key=True)
+    total_kg_co2e: Mapped[float] = mapped_column(Float)
+    sketch_json: Mapped[dict] = mapped_column(JSONB)
+    updated_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True))
+
+
+class SketchDirtyDay(Base):
+    # Ledger period_dates written since the last sketch refresh, recorded by trigger (see app.db.hotspots).
+    __tablename__ = "sketch_dirty_days"
+
+    period_date: Mapped[dt.date] = mapped_column(Date, primary_key=True)
+
+
 class ReportArtifact(Base):
     __tablename__ = "report_artifacts"
 
@@ -136,5 +234,44 @@ class ReportArtifact(Base):
     assumptions_json: Mapped[dict] = mapped_column(JSONB)
 
 
-Index("idx_ledger_period_scope_cat", CarbonLedgerLine.period_date, CarbonLedgerLine.scope, CarbonLedgerLine.category)
-
+# Ledger indexes follow the service query shapes (see app.db.indexes): the summary scan,
+# period range scans grouped by one dimension (hotspots, cube) and one key's rows over a
+# period (hotspot drill-down, which also reads the activity columns), all index-only;
+# keyset pagination on (computed_at, ledger_id), and a BRIN for wide ranges. Both
+# dimension orientations are chosen by the planner (scripts/explain_ledger_indexes.py).
+Index(
+    "idx_ledger_period_scope_cat_cov",
+    CarbonLedgerLine.period_date,
+    CarbonLedgerLine.scope,
+    CarbonLedgerLine.category,
+    postgresql_include=["kg_co2e", "confidence", "computed_at"],
+)
+for _dim in (CarbonLedgerLine.supplier_id, CarbonLedgerLine.lane_id, CarbonLedgerLine.sku, CarbonLedgerLine.facility_id):
+    Index(f"idx_ledger_period_{_dim.key}", CarbonLedgerLine.period_date, _dim, postgresql_include=["kg_co2e"])
+    Index(
+        f"idx_ledger_{_dim.key}_period_cov",
+        _dim,
+        CarbonLedgerLine.period_date,
+        postgresql_include=["kg_co2e", "activity_id", "activity_type"],
+    )
+Index("idx_ledger_computed_at_id", CarbonLedgerLine.computed_at, CarbonLedgerLine.ledger_id)
+Index("brin_ledger_period_date", CarbonLedgerLine.period_date, postgresql_using="brin")
+# NULL dimension keys are folded with coalesce so the rollup key stays unique (and usable by ON CONFLICT).
+Index(
+    "uq_rollup_key",
+    CarbonDailyRollup.period_date,
+    CarbonDailyRollup.scope,
+    CarbonDailyRollup.category,
+    CarbonDailyRollup.activity_type,
+    func.coalesce(CarbonDailyRollup.supplier_id, ""),
+    func.coalesce(CarbonDailyRollup.lane_id, ""),
+    func.coalesce(CarbonDailyRollup.sku, ""),
+    func.coalesce(CarbonDailyRollup.facility_id, ""),
+    unique=True,
+)
+Index(
+    "idx_hotspot_window_rank",
+    HotspotAggregate.window_key,
+    HotspotAggregate.dimension,
+    HotspotAggregate.kg_co2e_total.desc(),
+)
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import datetime as dt
+
+from sqlalchemy import MetaData, PrimaryKeyConstraint, Table, inspect, text
+from sqlalchemy.engine import Connection
+
+from app.db.hotspots import mark_dirty_from
+from app.db.models import CarbonLedgerLine, Supplier
+from app.db.watermarks import bump_months_from
+
+# Optional monthly range partitioning of carbon_ledger on period_date (settings.
+# ledger_partitioned). Every service query filters period_date, so the planner prunes to
+# the months in the window, and old months can be detached instead of deleted row by row.
+#
+# Postgres requires unique constraints on a partitioned table to include the partition
+# key, so the primary key becomes (ledger_id, period_date); the Pathway worker must
+# upsert on the same key (LEDGER_PARTITIONED=true in its environment). Rows whose month
+# has no partition yet land in carbon_ledger_default and are split out into their own
+# partition by the next ensure_ledger_partitions() run.
+
+DEFAULT_PARTITION = "carbon_ledger_default"
+
+
+def _month_start(d: dt.date) -> dt.date:
+    return d.replace(day=1)
+
+
+def _next_month(d: dt.date) -> dt.date:
+    return (d.replace(day=28) + dt.timedelta(days=4)).replace(day=1)
+
+
+def partition_name(month: dt.date) -> str:
+    return f"carbon_ledger_y{month.year:04d}m{month.month:02d}"
+
+
+def _partitioned_ledger_table() -> Table:
+    # Same columns and indexes as the ORM table; only the key and storage differ.
+    meta = MetaData()
+    Supplier.__table__.to_metadata(meta)
+    table = CarbonLedgerLine.__table__.to_metadata(meta)
+    table.c.period_date.primary_key = True
+    table.append_constraint(PrimaryKeyConstraint("ledger_id", "period_date", name="carbon_ledger_pkey"))
+    table.dialect_options["postgresql"]["partition_by"] = "RANGE (period_date)"
+    return table
+
+
+def ledger_is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(
+        conn.execute(
+            text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('carbon_ledger'))")
+        ).scalar_one()
+    )
+
+
+def _attached_months(conn: Connection) -> set[dt.date]:
+    rows = conn.execute(
+        text(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass('carbon_ledger')
+            """
+        )
+    ).scalars()
+    months = set()
+    for name in rows:
+        if name.startswith("carbon_ledger_y"):
+            months.add(dt.date(int(name[15:19]), int(name[20:22]), 1))
+    return months
+
+
+def _add_partition(conn: Connection, month: dt.date) -> None:
+    # Build the month as a standalone table, move any rows the default partition holds
+    # for it, then attach. CREATE TABLE ... PARTITION OF would fail outright if the
+    # default partition already had rows in range. Statement triggers on carbon_ledger
+    # don't fire for DML aimed at a partition, so the move leaves the rollup untouched.
+    name = partition_name(month)
+    lo, hi = month.isoformat(), _next_month(month).isoformat()
+    conn.execute(text(f"CREATE TABLE {name} (LIKE carbon_ledger INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(
+        text(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE period_date >= '{lo}' AND period_date < '{hi}'
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """
+        )
+    )
+    conn.execute(text(f"ALTER TABLE carbon_ledger ATTACH PARTITION {name} FOR VALUES FROM ('{lo}') TO ('{hi}')"))
+
+
+def ensure_ledger_partitions(conn: Connection, months_ahead: int, today: dt.date | None = None) -> list[str]:
+    """Create partitions through `months_ahead` months past today, plus one for every
+    month currently sitting in the default partition. Returns the partitions created."""
+    if not ledger_is_partitioned(conn):
+        return []
+    today = today or dt.date.today()
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF carbon_ledger DEFAULT"))
+
+    wanted = set()
+    month = _month_start(today)
+    for _ in range(months_ahead + 1):
+        wanted.add(month)
+        month = _next_month(month)
+    wanted |= set(
+        conn.execute(
+            text(f"SELECT DISTINCT date_trunc('month', period_date)::date FROM {DEFAULT_PARTITION}")
+        ).scalars()
+    )
+
+    created = []
+    for month in sorted(wanted - _attached_months(conn)):
+        _add_partition(conn, month)
+        created.append(partition_name(month))
+    return created
+
+
+def _convert_heap_ledger(conn: Connection) -> None:
+    # One-off conversion of an existing heap ledger: rename it (and its indexes, whose
+    # names the partitioned table reuses), recreate, copy, drop. Runs before the rollup,
+    # watermark and hotspot triggers are installed on the new table, and the rows are
+    # unchanged, so none of the derived tables need rebuilding.
+    conn.execute(text("LOCK TABLE carbon_ledger IN ACCESS EXCLUSIVE MODE"))
+    for (index_name,) in conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = 'carbon_ledger'")
+    ).all():
+        conn.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name[:55]}_heap"'))
+    conn.execute(text("ALTER TABLE carbon_ledger RENAME TO carbon_ledger_heap"))
+    _partitioned_ledger_table().create(conn)
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF carbon_ledger DEFAULT"))
+    for month in conn.execute(
+        text("SELECT DISTINCT date_trunc('month', period_date)::date FROM carbon_ledger_heap")
+    ).scalars():
+        conn.execute(
+            text(
+                f"CREATE TABLE {partition_name(month)} PARTITION OF carbon_ledger "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+            )
+        )
+    columns = ", ".join(c["name"] for c in inspect(conn).get_columns("carbon_ledger_heap"))
+    conn.execute(text(f"INSERT INTO carbon_ledger ({columns}) SELECT {columns} FROM carbon_ledger_heap"))
+    conn.execute(text("DROP TABLE carbon_ledger_heap"))
+
+
+def install_partitioned_ledger(conn: Connection, months_ahead: int) -> None:
+    """Create carbon_ledger partitioned (or convert an existing heap ledger) ahead of create_all."""
+    if conn.dialect.name != "postgresql":
+        return
+    if not inspect(conn).has_table("carbon_ledger"):
+        # Suppliers first: the ledger references it and create_all hasn't run yet.
+        Supplier.__table__.create(conn, checkfirst=True)
+        _partitioned_ledger_table().create(conn)
+    elif not ledger_is_partitioned(conn):
+        _convert_heap_ledger(conn)
+    ensure_ledger_partitions(conn, months_ahead)
+
+
+def detach_ledger_partition(conn: Connection, month: dt.date, drop: bool = False) -> str:
+    """Detach one month from carbon_ledger, keeping it as a standalone table to archive
+    (or dropping it). Derived state is updated as if the month's rows were deleted: its
+    rollup days are removed, its hotspot keys and sketch days are marked dirty, and the
+    ledger and month watermarks move so cached responses are invalidated."""
+    name = partition_name(_month_start(month))
+    lo, hi = _month_start(month).isoformat(), _next_month(month).isoformat()
+    conn.execute(text(f"ALTER TABLE carbon_ledger DETACH PARTITION {name}"))
+    conn.execute(text(f"DELETE FROM carbon_daily_rollup WHERE period_date >= '{lo}' AND period_date < '{hi}'"))
+    mark_dirty_from(conn, name)
+    bump_months_from(conn, name)
+    conn.execute(
+        text(
+            "UPDATE ingest_watermarks SET change_seq = change_seq + 1, updated_at = now() "
+            "WHERE source IN ('shipments', 'electricity_bills')"
+        )
+    )
+    if drop:
+        conn.execute(text(f"DROP TABLE {name}"))
+    return name
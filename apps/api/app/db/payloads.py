@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import datetime as dt
+
+from sqlalchemy import func, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.db.models import CarbonLedgerLine, LedgerPayload
+
+# Nearly every ledger row carries one of a handful of identical assumptions documents.
+# Writers (the Pathway worker) store the document inline. scripts/intern_ledger_payloads.py
+# later compacts settled months offline: each distinct document goes into ledger_payloads
+# (keyed by the md5 of its jsonb text) and those rows keep only the 4-byte payload_id.
+# Readers take the inline document when present, else the interned one. A writer that
+# upserts a compacted row sends the document inline again, and that copy wins.
+#
+# An earlier version interned on write with a BEFORE ROW trigger. For documents this
+# small it saved little and put a PL/pgSQL call on every pipeline write, so
+# drop_payload_interning() removes it from databases that have it.
+#
+# lineage_json is left inline: it holds per-activity values (source row, event_time),
+# so there is nothing to share, and the watermark trigger reads event_time from it.
+
+
+def migrate_ledger_payload_columns(conn: Connection) -> None:
+    # create_all doesn't alter existing tables: add the reference column and let the
+    # inline document go NULL.
+    insp = inspect(conn)
+    if not insp.has_table("carbon_ledger"):
+        return
+    if "assumptions_id" not in {c["name"] for c in insp.get_columns("carbon_ledger")}:
+        conn.execute(text("ALTER TABLE carbon_ledger ADD COLUMN assumptions_id integer"))
+        conn.execute(text("ALTER TABLE carbon_ledger ALTER COLUMN assumptions_json DROP NOT NULL"))
+
+
+def drop_payload_interning(conn: Connection) -> None:
+    if conn.dialect.name != "postgresql":
+        return
+    conn.execute(text("DROP TRIGGER IF EXISTS ledger_intern_payloads ON carbon_ledger"))
+    conn.execute(text("DROP FUNCTION IF EXISTS ledger_intern_payloads()"))
+
+
+def intern_ledger_payloads(engine: Engine, before: dt.date) -> int:
+    """Move inline assumptions documents of rows dated before `before` into ledger_payloads.
+
+    Maintenance, not startup work: each month of period_date is one transaction. It
+    takes SHARE ROW EXCLUSIVE on carbon_ledger, which blocks ledger writes until it
+    commits, and runs with no statement_timeout. Only the payload columns change, so
+    the ledger's derived-state triggers (rollup, watermarks, hotspot dirty keys) are
+    disabled for each batch rather than fed an UPDATE they would record as activity.
+    DISABLE TRIGGER needs the same lock, so no concurrent write can slip past them,
+    and it is undone before the batch commits. Returns the number of rows compacted.
+    """
+    if engine.dialect.name != "postgresql":
+        return 0
+    with engine.connect() as conn:
+        months = conn.execute(
+            text(
+                """
+                SELECT DISTINCT date_trunc('month', period_date)::date FROM carbon_ledger
+                WHERE assumptions_json IS NOT NULL AND period_date < :before ORDER BY 1
+                """
+            ),
+            {"before": before},
+        ).scalars().all()
+    interned = 0
+    for month in months:
+        bounds = {"month": month, "before": before}
+        with engine.begin() as conn:
+            conn.execute(text("SET LOCAL statement_timeout = 0"))
+            conn.execute(text("LOCK TABLE carbon_ledger IN SHARE ROW EXCLUSIVE MODE"))
+            conn.execute(text("ALTER TABLE carbon_ledger DISABLE TRIGGER USER"))
+            conn.execute(
+                text(
+                    """
+                    INSERT INTO ledger_payloads (payload_hash, payload)
+                    SELECT DISTINCT md5(assumptions_json::text), assumptions_json
+                    FROM carbon_ledger
+                    WHERE assumptions_json IS NOT NULL
+                      AND period_date >= :month AND period_date < CAST(:month AS date) + interval '1 month'
+                      AND period_date < :before
+                    ON CONFLICT (payload_hash) DO NOTHING
+                    """
+                ),
+                bounds,
+            )
+            interned += conn.execute(
+                text(
+                    """
+                    UPDATE carbon_ledger AS l
+                    SET assumptions_id = p.payload_id, assumptions_json = NULL
+                    FROM ledger_payloads AS p
+                    WHERE l.assumptions_json IS NOT NULL
+                      AND l.period_date >= :month AND l.period_date < CAST(:month AS date) + interval '1 month'
+                      AND l.period_date < :before
+                      AND p.payload_hash = md5(l.assumptions_json::text)
+                    """
+                ),
+                bounds,
+            ).rowcount
+            conn.execute(text("ALTER TABLE carbon_ledger ENABLE TRIGGER USER"))
+    return interned
+
+
+def ledger_assumptions() -> ColumnElement:
+    """The row's assumptions document, inline or interned; use with join_payloads()."""
+    return func.coalesce(CarbonLedgerLine.assumptions_json, LedgerPayload.payload)
+
+
+def join_payloads(q: Select) -> Select:
+    return q.outerjoin(LedgerPayload, LedgerPayload.payload_id == CarbonLedgerLine.assumptions_id)
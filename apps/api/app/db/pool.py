@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import Pool, QueuePool
+
+
+class PoolStats:
+    # Checkout-side counters for one engine's pool. Wait time is measured around the
+    # pool's own _do_get, so it covers queueing for a free connection (starvation) and
+    # opening new ones, but none of the SQL that runs afterwards.
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflow_events = 0
+        self.timeouts = 0
+
+    def record_checkout(self, wait_seconds: float, overflowed: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+            if overflowed:
+                self.overflow_events += 1
+
+    def record_timeout(self, wait_seconds: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.wait_seconds_total += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def snapshot(self, pool: Pool) -> dict:
+        with self._lock:
+            out = {
+                "checkouts": self.checkouts,
+                "checkout_wait_seconds_total": self.wait_seconds_total,
+                "checkout_wait_seconds_avg": (self.wait_seconds_total / self.checkouts) if self.checkouts else 0.0,
+                "checkout_wait_seconds_max": self.wait_seconds_max,
+                "overflow_events": self.overflow_events,
+                "checkout_timeouts": self.timeouts,
+            }
+        if isinstance(pool, QueuePool):
+            out.update(
+                {
+                    "pool_size": pool.size(),
+                    "checked_in": pool.checkedin(),
+                    "in_use": pool.checkedout(),
+                    "overflow": max(pool.overflow(), 0),
+                }
+            )
+        return out
+
+
+class _InstrumentedQueuePool:
+    stats: PoolStats
+
+    def _do_get(self):
+        overflow_before = self._overflow
+        t0 = time.perf_counter()
+        try:
+            rec = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_timeout(time.perf_counter() - t0)
+            raise
+        # _overflow counts up from -pool_size, so it only goes positive once the
+        # pool has opened connections beyond pool_size.
+        self.stats.record_checkout(
+            time.perf_counter() - t0, overflowed=self._overflow > overflow_before and self._overflow > 0
+        )
+        return rec
+
+
+def instrumented_pool(base: type[QueuePool], stats: PoolStats) -> type[QueuePool]:
+    # A subclass per engine: Pool.recreate() rebuilds via self.__class__, so the stats
+    # survive engine.dispose().
+    return type(f"Instrumented{base.__name__}", (_InstrumentedQueuePool, base), {"stats": stats})
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# carbon_daily_rollup is kept in step with carbon_ledger by statement-level triggers.
+# The Pathway worker writes the ledger directly (snapshot upserts + retractions), so the
+# database is the only place every write passes through. Transition tables let one
+# trigger call fold a whole batch of ledger changes into a handful of rollup upserts.
+
+ROLLUP_KEY = "period_date, scope, category, activity_type, supplier_id, lane_id, sku, facility_id"
+ROLLUP_CONFLICT_KEY = (
+    "period_date, scope, category, activity_type, "
+    "(coalesce(supplier_id, '')), (coalesce(lane_id, '')), (coalesce(sku, '')), (coalesce(facility_id, ''))"
+)
+ROLLUP_KEY_MATCH = """
+    r.period_date = o.period_date
+    AND r.scope = o.scope
+    AND r.category = o.category
+    AND r.activity_type = o.activity_type
+    AND coalesce(r.supplier_id, '') = coalesce(o.supplier_id, '')
+    AND coalesce(r.lane_id, '') = coalesce(o.lane_id, '')
+    AND coalesce(r.sku, '') = coalesce(o.sku, '')
+    AND coalesce(r.facility_id, '') = coalesce(o.facility_id, '')
+"""
+
+_ROLLUP_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION carbon_rollup_sync() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    emptied bigint[];
+    touched bigint[];
+    touched_max timestamptz[];
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        -- Collect emptied keys from the UPDATE itself and delete them by id; re-joining
+        -- old_rows against the rollup a second time plans poorly on large batches.
+        -- Surviving keys whose last_computed_at came from a removed row are remembered
+        -- with that row's computed_at, to be re-read from the ledger below.
+        WITH o AS (
+            SELECT {ROLLUP_KEY}, sum(kg_co2e) AS kg, count(*) AS n, sum(confidence) AS conf,
+                   max(computed_at) AS computed
+            FROM old_rows
+            GROUP BY {ROLLUP_KEY}
+        ), dec AS (
+            UPDATE carbon_daily_rollup AS r
+            SET kg_co2e_sum = r.kg_co2e_sum - o.kg,
+                activity_count = r.activity_count - o.n,
+                confidence_sum = r.confidence_sum - o.conf
+            FROM o
+            WHERE {ROLLUP_KEY_MATCH}
+            RETURNING r.rollup_id, r.activity_count, r.last_computed_at <= o.computed AS held_max, o.computed
+        )
+        SELECT array_agg(rollup_id) FILTER (WHERE activity_count <= 0),
+               array_agg(rollup_id) FILTER (WHERE activity_count > 0 AND held_max),
+               array_agg(computed) FILTER (WHERE activity_count > 0 AND held_max)
+        INTO emptied, touched, touched_max
+        FROM dec;
+
+        IF emptied IS NOT NULL THEN
+            DELETE FROM carbon_daily_rollup WHERE rollup_id = ANY (emptied);
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO carbon_daily_rollup AS r (
+            {ROLLUP_KEY}, kg_co2e_sum, activity_count, confidence_sum, last_computed_at
+        )
+        SELECT {ROLLUP_KEY}, sum(kg_co2e), count(*), sum(confidence), max(computed_at)
+        FROM new_rows
+        GROUP BY {ROLLUP_KEY}
+        ON CONFLICT ({ROLLUP_CONFLICT_KEY}) DO UPDATE
+        SET kg_co2e_sum = r.kg_co2e_sum + EXCLUDED.kg_co2e_sum,
+            activity_count = r.activity_count + EXCLUDED.activity_count,
+            confidence_sum = r.confidence_sum + EXCLUDED.confidence_sum,
+            last_computed_at = greatest(r.last_computed_at, EXCLUDED.last_computed_at);
+    END IF;
+
+    -- A new row at or past the removed max already set a value that exists; otherwise
+    -- take the max over the key's remaining ledger rows (one day, by period_date).
+    IF touched IS NOT NULL THEN
+        UPDATE carbon_daily_rollup AS r
+        SET last_computed_at = (
+            SELECT max(o.computed_at) FROM carbon_ledger AS o WHERE {ROLLUP_KEY_MATCH}
+        )
+        FROM unnest(touched, touched_max) AS t(rollup_id, computed)
+        WHERE r.rollup_id = t.rollup_id AND r.last_computed_at <= t.computed;
+    END IF;
+
+    RETURN NULL;
+END
+$$;
+"""
+
+_ROLLUP_TRUNCATE_FUNCTION = """
+CREATE OR REPLACE FUNCTION carbon_rollup_truncate() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    TRUNCATE carbon_daily_rollup;
+    RETURN NULL;
+END
+$$;
+"""
+
+_ROLLUP_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS carbon_rollup_ins ON carbon_ledger",
+    "DROP TRIGGER IF EXISTS carbon_rollup_upd ON carbon_ledger",
+    "DROP TRIGGER IF EXISTS carbon_rollup_del ON carbon_ledger",
+    "DROP TRIGGER IF EXISTS carbon_rollup_trunc ON carbon_ledger",
+    """CREATE TRIGGER carbon_rollup_ins AFTER INSERT ON carbon_ledger
+       REFERENCING NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION carbon_rollup_sync()""",
+    """CREATE TRIGGER carbon_rollup_upd AFTER UPDATE ON carbon_ledger
+       REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION carbon_rollup_sync()""",
+    """CREATE TRIGGER carbon_rollup_del AFTER DELETE ON carbon_ledger
+       REFERENCING OLD TABLE AS old_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION carbon_rollup_sync()""",
+    """CREATE TRIGGER carbon_rollup_trunc AFTER TRUNCATE ON carbon_ledger
+       FOR EACH STATEMENT EXECUTE FUNCTION carbon_rollup_truncate()""",
+]
+
+
+def rebuild_rollup(conn: Connection) -> None:
+    conn.execute(text("TRUNCATE carbon_daily_rollup"))
+    conn.execute(
+        text(
+            f"""
+            INSERT INTO carbon_daily_rollup (
+                {ROLLUP_KEY}, kg_co2e_sum, activity_count, confidence_sum, last_computed_at
+            )
+            SELECT {ROLLUP_KEY}, sum(kg_co2e), count(*), sum(confidence), max(computed_at)
+            FROM carbon_ledger
+            GROUP BY {ROLLUP_KEY}
+            """
+        )
+    )
+
+
+def install_rollup(conn: Connection) -> None:
+    if conn.dialect.name != "postgresql":
+        return
+    # Block ledger writes while the triggers go in so the backfill and the
+    # trigger-maintained deltas can't overlap or miss a batch.
+    conn.execute(text("LOCK TABLE carbon_ledger IN SHARE ROW EXCLUSIVE MODE"))
+    conn.execute(text(_ROLLUP_FUNCTION))
+    conn.execute(text(_ROLLUP_TRUNCATE_FUNCTION))
+    for stmt in _ROLLUP_TRIGGERS:
+        conn.execute(text(stmt))
+
+    rollup_empty = conn.execute(text("SELECT NOT EXISTS (SELECT 1 FROM carbon_daily_rollup)")).scalar_one()
+    ledger_has_rows = conn.execute(text("SELECT EXISTS (SELECT 1 FROM carbon_ledger)")).scalar_one()
+    if rollup_empty and ledger_has_rows:
+        rebuild_rollup(conn)
+
+
+def rollup_installed(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(
+        conn.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_trigger "
+                "WHERE tgname = 'carbon_rollup_ins' AND tgrelid = to_regclass('carbon_ledger'))"
+            )
+        ).scalar_one()
+    )
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, TypeVar
+
+from sqlalchemy.util import await_only
+from sqlalchemy.util.concurrency import in_greenlet
+from starlette.concurrency import run_in_threadpool
+
+from app.db.engine import AsyncSessionLocal, RequestSessionLocal
+
+T = TypeVar("T")
+
+
+def _call_sync(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    with RequestSessionLocal() as db:
+        return fn(db, *args, **kwargs)
+
+
+async def run_db(
+    fn: Callable[..., T], *args: Any, native: Callable[..., Awaitable[T]] | None = None, **kwargs: Any
+) -> T:
+    """Run a service function ``fn(db, *args, **kwargs)`` against a fresh session.
+
+    By default it runs on the threadpool with a regular Session. When the async engine
+    is built (ASYNC_DB_ENABLED, bench only) the ``native`` variant, an ``async def``
+    taking an AsyncSession and the same arguments, is awaited on the event loop; the hot paths (summary, hotspots, simulate, report)
+    have one. Services without it run on the AsyncSession via ``run_sync``, where their
+    non-query work runs on the event-loop thread unless passed through offload().
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            if native is not None:
+                return await native(session, *args, **kwargs)
+            return await session.run_sync(lambda db: fn(db, *args, **kwargs))
+    return await run_in_threadpool(_call_sync, fn, *args, **kwargs)
+
+
+def offload(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Call ``fn`` from inside a service, off the event loop when there is one.
+
+    Under the async engine services run in SQLAlchemy's greenlet on the event-loop thread;
+    this suspends that greenlet while ``fn`` runs on the threadpool, as a query would
+    while it awaits the driver. On the sync path it is a plain call.
+    """
+    if in_greenlet():
+        return await_only(run_in_threadpool(fn, *args, **kwargs))
+    return fn(*args, **kwargs)
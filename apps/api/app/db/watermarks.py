@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# ingest_watermarks holds one row per input stream. Like the daily rollup, it is
+# maintained by statement-level triggers on the tables the Pathway worker writes, so
+# reading freshness never touches the ledger. change_seq moves on every write
+# statement (deletes included) and doubles as a cheap "ledger changed" token.
+
+_LEDGER_SOURCE = """
+    CASE activity_type
+        WHEN 'shipment' THEN 'shipments'
+        WHEN 'purchased_goods' THEN 'shipments'
+        WHEN 'electricity_bill' THEN 'electricity_bills'
+        ELSE activity_type
+    END
+"""
+
+_WATERMARK_UPSERT = """
+    ON CONFLICT (source) DO UPDATE
+    SET last_event_time = greatest(w.last_event_time, EXCLUDED.last_event_time),
+        last_computed_at = greatest(w.last_computed_at, EXCLUDED.last_computed_at),
+        ingest_lag_seconds = coalesce(EXCLUDED.ingest_lag_seconds, w.ingest_lag_seconds),
+        rows_written = w.rows_written + EXCLUDED.rows_written,
+        change_seq = w.change_seq + 1,
+        updated_at = EXCLUDED.updated_at
+"""
+
+# lineage_json ->> 'event_time' as timestamptz, or NULL when it isn't an ISO-8601
+# timestamp. Called per written row, so it is plain SQL guarded by a pattern and a
+# day-of-month check (CASE branches are evaluated in order) rather than a plpgsql
+# EXCEPTION block, which would open a subtransaction per row. Anything that passes the
+# guards casts without error. (pg_input_is_valid would do, but it needs Postgres 16.)
+_TRY_TIMESTAMPTZ = r"""
+CREATE OR REPLACE FUNCTION carbon_try_timestamptz(s text) RETURNS timestamptz
+LANGUAGE sql STABLE AS $$
+SELECT CASE
+    WHEN s !~ '^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])([T ]([01]\d|2[0-3]):[0-5]\d(:[0-5]\d(\.\d{1,6})?)?)?(Z|[+-]([01]\d|2[0-3])(:?[0-5]\d)?)?$'
+        THEN NULL
+    WHEN s LIKE '0000%' THEN NULL
+    WHEN substr(s, 9, 2) > '28' AND substr(s, 9, 2)::int > extract(
+        day FROM make_date(substr(s, 1, 4)::int, substr(s, 6, 2)::int, 1) + interval '1 month - 1 day'
+    ) THEN NULL
+    ELSE s::timestamptz
+END
+$$;
+"""
+
+_LEDGER_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION ingest_watermark_ledger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO ingest_watermarks AS w (source, rows_written, change_seq, updated_at)
+        SELECT DISTINCT {_LEDGER_SOURCE}, 0, 1, now()
+        FROM old_rows
+        {_WATERMARK_UPSERT};
+    ELSE
+        INSERT INTO ingest_watermarks AS w (
+            source, last_event_time, last_computed_at, ingest_lag_seconds, rows_written, change_seq, updated_at
+        )
+        SELECT src, max(event_time), max(computed_at),
+               extract(epoch FROM max(computed_at) - max(event_time)),
+               count(*), 1, now()
+        FROM (
+            SELECT {_LEDGER_SOURCE} AS src,
+                   carbon_try_timestamptz(lineage_json ->> 'event_time') AS event_time,
+                   computed_at
+            FROM new_rows
+        ) AS b
+        GROUP BY src
+        {_WATERMARK_UPSERT};
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+_SUPPLIERS_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION ingest_watermark_suppliers() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO ingest_watermarks AS w (
+        source, last_event_time, last_computed_at, ingest_lag_seconds, rows_written, change_seq, updated_at
+    )
+    SELECT 'suppliers', max(last_updated_at), now(),
+           extract(epoch FROM now() - max(last_updated_at)),
+           count(*), 1, now()
+    FROM new_rows
+    HAVING count(*) > 0
+    {_WATERMARK_UPSERT};
+    RETURN NULL;
+END
+$$;
+"""
+
+# ledger_month_watermarks: the same change counter per period_date month, so caches of
+# window-scoped results (scenarios, optimizer) only move when a month they cover is written.
+_MONTHS_FROM = """
+        INSERT INTO ledger_month_watermarks AS w (month, change_seq, updated_at)
+        SELECT DISTINCT date_trunc('month', period_date)::date, 1, now()
+        FROM {rows}
+        ON CONFLICT (month) DO UPDATE
+        SET change_seq = w.change_seq + 1,
+            updated_at = EXCLUDED.updated_at;
+"""
+
+_MONTH_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION ledger_month_watermark() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        {_MONTHS_FROM.format(rows="old_rows")}
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        {_MONTHS_FROM.format(rows="new_rows")}
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS ingest_watermark_ins ON carbon_ledger",
+    "DROP TRIGGER IF EXISTS ingest_watermark_upd ON carbon_ledger",
+    "DROP TRIGGER IF EXISTS ingest_watermark_del ON carbon_ledger",
+    "DROP TRIGGER IF EXISTS ingest_watermark_ins ON suppliers",
+    "DROP TRIGGER IF EXISTS ingest_watermark_upd ON suppliers",
+    """CREATE TRIGGER ingest_watermark_ins AFTER INSERT ON carbon_ledger
+       REFERENCING NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION ingest_watermark_ledger()""",
+    """CREATE TRIGGER ingest_watermark_upd AFTER UPDATE ON carbon_ledger
+       REFERENCING NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION ingest_watermark_ledger()""",
+    """CREATE TRIGGER ingest_watermark_del AFTER DELETE ON carbon_ledger
+       REFERENCING OLD TABLE AS old_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION ingest_watermark_ledger()""",
+    "DROP TRIGGER IF EXISTS ledger_month_watermark_ins ON carbon_ledger",
+    "DROP TRIGGER IF EXISTS ledger_month_watermark_upd ON carbon_ledger",
+    "DROP TRIGGER IF EXISTS ledger_month_watermark_del ON carbon_ledger",
+    """CREATE TRIGGER ledger_month_watermark_ins AFTER INSERT ON carbon_ledger
+       REFERENCING NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION ledger_month_watermark()""",
+    """CREATE TRIGGER ledger_month_watermark_upd AFTER UPDATE ON carbon_ledger
+       REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION ledger_month_watermark()""",
+    """CREATE TRIGGER ledger_month_watermark_del AFTER DELETE ON carbon_ledger
+       REFERENCING OLD TABLE AS old_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION ledger_month_watermark()""",
+    """CREATE TRIGGER ingest_watermark_ins AFTER INSERT ON suppliers
+       REFERENCING NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION ingest_watermark_suppliers()""",
+    """CREATE TRIGGER ingest_watermark_upd AFTER UPDATE ON suppliers
+       REFERENCING NEW TABLE AS new_rows
+       FOR EACH STATEMENT EXECUTE FUNCTION ingest_watermark_suppliers()""",
+]
+
+_BACKFILL = f"""
+INSERT INTO ingest_watermarks (
+    source, last_event_time, last_computed_at, ingest_lag_seconds, rows_written, change_seq, updated_at
+)
+SELECT src, max(event_time), max(computed_at), NULL::double precision, count(*), 0, now()
+FROM (
+    SELECT {_LEDGER_SOURCE} AS src,
+           carbon_try_timestamptz(lineage_json ->> 'event_time') AS event_time,
+           computed_at
+    FROM carbon_ledger
+) AS b
+GROUP BY src
+UNION ALL
+SELECT 'suppliers', max(last_updated_at), max(last_updated_at), NULL::double precision, count(*), 0, now()
+FROM suppliers
+HAVING count(*) > 0
+"""
+
+
+def install_watermarks(conn: Connection) -> None:
+    if conn.dialect.name != "postgresql":
+        return
+    conn.execute(text("LOCK TABLE carbon_ledger, suppliers IN SHARE ROW EXCLUSIVE MODE"))
+    conn.execute(text(_TRY_TIMESTAMPTZ))
+    conn.execute(text(_LEDGER_FUNCTION))
+    conn.execute(text(_SUPPLIERS_FUNCTION))
+    conn.execute(text(_MONTH_FUNCTION))
+    for stmt in _TRIGGERS:
+        conn.execute(text(stmt))
+
+    # One-off seed from existing history; afterwards the triggers keep it current.
+    if not conn.execute(text("SELECT EXISTS (SELECT 1 FROM ingest_watermarks)")).scalar_one():
+        conn.execute(text(_BACKFILL))
+
+
+def bump_months_from(conn: Connection, table: str) -> None:
+    # Advance the month watermarks covered by `table`, as the triggers would for rows
+    # that leave the ledger without DML (a detached partition).
+    conn.execute(text(_MONTHS_FROM.format(rows=table)))
@@ -1,37 +1,107 @@
 from __future__ import annotations
 
 import datetime as dt
+import hashlib
+import time
+from typing import Awaitable, Callable
 
-from fastapi import Depends, FastAPI, HTTPException, Query
+import orjson
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from app.core.cache import CacheEntry, ResultCache, etag_for, etag_matches
 from app.core.config import settings
-from app.db.engine import SessionLocal
+from app.core.metrics import HTTP_REQUEST_SECONDS, REGISTRY, gauge_lines
+from app.db.engine import pool_status
 from app.db.init_db import init_db
-from app.db.models import ReportArtifact
+from app.db.session import offload, run_db
 from app.schemas.models import (
     CarbonSummaryResponse,
     OptimizeRequest,
     OptimizeResponse,
     ReportArtifactModel,
     ReportGenerateRequest,
+    ScenarioBatchRequest,
+    ScenarioBatchResponse,
     ScenarioRequest,
     ScenarioResponse,
 )
 from app.services import carbon as carbon_svc
+from app.services import cube as cube_svc
+from app.services import export as export_svc
+from app.services import freshness as freshness_svc
+from app.services import hotspot_refresh as hotspot_refresh_svc
+from app.services import hotspot_sketches as hotspot_sketches_svc
 from app.services import optimizer as optimizer_svc
 from app.services import reports as reports_svc
 from app.services import scenario as scenario_svc
+from app.services import uncertainty as uncertainty_svc
+from app.workers import hotspot_refresher, ledger_partitions
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+response_cache = ResultCache(
+    "responses",
+    max_entries=settings.response_cache_max_entries,
+    max_bytes=settings.response_cache_max_bytes,
+)
+# /simulate and /optimize results, keyed by canonical request hash and window watermark.
+scenario_cache = ResultCache(
+    "scenarios",
+    max_entries=settings.scenario_cache_max_entries,
+    max_bytes=settings.scenario_cache_max_bytes,
+)
+
+
+def _encode(value: dict, model: type[BaseModel] | None) -> bytes:
+    if model is not None:
+        value = model.model_validate(value).model_dump(mode="json")
+    return orjson.dumps(value)
+
+
+async def _cached_json(
+    request: Request,
+    endpoint: str,
+    params: dict,
+    compute: Callable[[Session], dict],
+    model: type[BaseModel] | None = None,
+    cache: ResultCache = response_cache,
+    watermark: Callable[[Session], str] = freshness_svc.ledger_watermark,
+    native: Callable[[AsyncSession], Awaitable[dict]] | None = None,
+    native_watermark: Callable[[AsyncSession], Awaitable[str]] = freshness_svc.ledger_watermark_async,
+):
+    # Results only change when the ledger does, so they are keyed on the ledger
+    # watermark (one small indexed read) and served without re-aggregating. `native` /
+    # `native_watermark` are the async-session variants used with the async engine (see run_db).
+    if not settings.response_cache_enabled:
+        return await run_db(compute, native=native)
+    params_key = tuple(sorted((k, str(v)) for k, v in params.items()))
+
+    def _load(db: Session) -> CacheEntry:
+        key = (endpoint, params_key, watermark(db))
+        entry = cache.get(key)
+        if entry is None:
+            body = offload(_encode, compute(db), model)
+            entry = cache.put(key, body, size=len(body), etag=etag_for(body))
+        return entry
+
+    async def _load_native(session: AsyncSession) -> CacheEntry:
+        key = (endpoint, params_key, await native_watermark(session))
+        entry = cache.get(key)
+        if entry is None:
+            body = await run_in_threadpool(_encode, await native(session), model)
+            entry = cache.put(key, body, size=len(body), etag=etag_for(body))
+        return entry
+
+    entry = await run_db(_load, native=_load_native if native is not None else None)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if request.method == "GET" and etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.value, media_type="application/json", headers=headers)
 
 
 app = FastAPI(title="Carbon Intelligence Platform API", version="0.1.0")
@@ -45,9 +115,83 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def _record_latency(request: Request, call_next):
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/report/{report_id}), not the raw path, to keep
+        # series cardinality bounded.
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - t0, request.method, getattr(route, "path", "unmatched"), str(status)
+        )
+
+
+def _pool_metrics() -> list[str]:
+    status = pool_status()
+    lines: list[str] = []
+    for name, key, kind, help in (
+        ("db_pool_in_use", "in_use", "gauge", "Connections currently checked out."),
+        ("db_pool_checked_in", "checked_in", "gauge", "Idle connections in the pool."),
+        ("db_pool_overflow", "overflow", "gauge", "Connections open beyond pool_size."),
+        ("db_pool_checkouts_total", "checkouts", "counter", "Successful pool checkouts."),
+        (
+            "db_pool_checkout_wait_seconds_total",
+            "checkout_wait_seconds_total",
+            "counter",
+            "Time spent waiting for a pooled connection.",
+        ),
+        ("db_pool_checkout_wait_seconds_max", "checkout_wait_seconds_max", "gauge", "Longest single checkout wait."),
+        ("db_pool_overflow_events_total", "overflow_events", "counter", "Checkouts that opened overflow connections."),
+        ("db_pool_checkout_timeouts_total", "checkout_timeouts", "counter", "Checkouts that hit pool_timeout."),
+    ):
+        lines.extend(gauge_lines(name, help, (({"engine": e}, st.get(key, 0)) for e, st in status.items()), kind))
+    return lines
+
+
+def _cache_metrics() -> list[str]:
+    stats = [({"cache": c.name}, c.stats()) for c in (response_cache, scenario_cache)]
+    lines: list[str] = []
+    for name, key, kind, help in (
+        ("response_cache_hits_total", "hits", "counter", "Response cache hits."),
+        ("response_cache_misses_total", "misses", "counter", "Response cache misses."),
+        ("response_cache_evictions_total", "evictions", "counter", "Entries evicted to stay within bounds."),
+        ("response_cache_hit_ratio", "hit_rate", "gauge", "Hits over lookups since start."),
+        ("response_cache_entries", "entries", "gauge", "Entries held by the response cache."),
+        ("response_cache_bytes", "bytes", "gauge", "Bytes held by the response cache."),
+    ):
+        lines.extend(gauge_lines(name, help, ((labels, st[key]) for labels, st in stats), kind))
+    return lines
+
+
+REGISTRY.add_collector(_pool_metrics)
+REGISTRY.add_collector(_cache_metrics)
+
+
 @app.on_event("startup")
 def _startup() -> None:
     init_db(load_seed=True)
+    uncertainty_svc.start_pool()
+    if settings.hotspot_refresh_interval_seconds > 0:
+        app.state.hotspot_refresher_stop = hotspot_refresher.start_in_process(
+            settings.hotspot_refresh_interval_seconds
+        )
+    if settings.ledger_partitioned:
+        app.state.ledger_partitions_stop = ledger_partitions.start_in_process()
+
+
+@app.on_event("shutdown")
+def _shutdown() -> None:
+    for name in ("hotspot_refresher_stop", "ledger_partitions_stop"):
+        stop = getattr(app.state, name, None)
+        if stop is not None:
+            stop.set()
+    uncertainty_svc.shutdown_pool()
 
 
 @app.get("/health")
@@ -55,6 +199,22 @@ def health() -> dict:
     return {"ok": True, "service": "api", "time": dt.datetime.now(dt.timezone.utc).isoformat()}
 
 
+@app.get("/cache/stats")
+def cache_stats() -> dict:
+    return {"responses": response_cache.stats(), "scenarios": scenario_cache.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/db/pool")
+def db_pool() -> dict:
+    # Checkout wait vs. in-use/overflow separates pool starvation from slow SQL.
+    return pool_status()
+
+
 @app.get("/ingest/status")
 def ingest_status() -> dict:
     return {
@@ -66,87 +226,326 @@ def ingest_status() -> dict:
 
 
 @app.get("/data/freshness")
-def data_freshness(db: Session = Depends(get_db)) -> dict:
-    # Use max computed_at from ledger as freshness marker.
-    q = carbon_svc.carbon_summary(db, dt.date(2000, 1, 1), dt.date(2100, 1, 1))
-    return {"ledger_last_computed_at": q["freshness"]["last_computed_at"]}
+async def data_freshness() -> dict:
+    # Per-stream watermarks are maintained on write; this is a constant-size read.
+    return await run_db(freshness_svc.data_freshness)
 
 
 @app.get("/carbon/summary", response_model=CarbonSummaryResponse)
-def carbon_summary(
+async def carbon_summary(
+    request: Request,
     from_: str = Query(..., alias="from"),
     to: str = Query(...),
-    db: Session = Depends(get_db),
+    grain: str = Query("day", pattern="^(day|week|month)$"),
+    max_points: int | None = Query(None, ge=3, le=10000),
 ):
     from_date = carbon_svc.parse_date(from_)
     to_date = carbon_svc.parse_date(to)
-    return carbon_svc.carbon_summary(db, from_date, to_date)
+    return await _cached_json(
+        request,
+        "carbon_summary",
+        {"from": from_date, "to": to_date, "grain": grain, "max_points": max_points},
+        lambda db: carbon_svc.carbon_summary(db, from_date, to_date, grain, max_points),
+        CarbonSummaryResponse,
+        native=lambda session: carbon_svc.carbon_summary_async(session, from_date, to_date, grain, max_points),
+    )
 
 
 @app.get("/carbon/ledger")
-def carbon_ledger(
+async def carbon_ledger(
     from_: str = Query(..., alias="from"),
     to: str = Query(...),
     scope: int | None = Query(None),
     category: str | None = Query(None),
     limit: int = Query(200, ge=1, le=1000),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
+    cursor: str | None = Query(None),
+    include_total: bool = Query(True),
+    fields: str | None = Query(
+        None, description="Comma-separated ledger columns, or * for all; default omits lineage_json/assumptions_json"
+    ),
 ):
     from_date = carbon_svc.parse_date(from_)
     to_date = carbon_svc.parse_date(to)
-    return carbon_svc.list_ledger(db, from_date, to_date, scope, category, limit, offset)
+    if fields is None:
+        field_list = None
+    elif fields.strip() == "*":
+        field_list = list(carbon_svc.LEDGER_FIELDS)
+    else:
+        field_list = [f.strip() for f in fields.split(",") if f.strip()]
+    try:
+        return await run_db(
+            carbon_svc.list_ledger,
+            from_date,
+            to_date,
+            scope,
+            category,
+            limit,
+            offset,
+            cursor=cursor,
+            include_total=include_total,
+            fields=field_list,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/carbon/cube")
+async def carbon_cube(
+    request: Request,
+    from_: str = Query(..., alias="from"),
+    to: str = Query(...),
+    dims: str = Query("", description="Comma-separated: scope,category,supplier,lane,sku,facility,mode,state"),
+    grain: str = Query("month", pattern="^(day|week|month|quarter|fy)$"),
+    limit: int = Query(5000, ge=1, le=50000),
+):
+    from_date = carbon_svc.parse_date(from_)
+    to_date = carbon_svc.parse_date(to)
+    dim_list = [d.strip() for d in dims.split(",") if d.strip()]
+    try:
+        return await _cached_json(
+            request,
+            "carbon_cube",
+            {"from": from_date, "to": to_date, "dims": ",".join(dim_list), "grain": grain, "limit": limit},
+            lambda db: cube_svc.carbon_cube(db, dim_list, grain, from_date, to_date, limit),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/carbon/ledger/export")
+def carbon_ledger_export(
+    from_: str = Query(..., alias="from"),
+    to: str = Query(...),
+    scope: int | None = Query(None),
+    category: str | None = Query(None),
+    format: str = Query("ndjson", pattern="^(ndjson|csv|arrow)$"),
+):
+    from_date = carbon_svc.parse_date(from_)
+    to_date = carbon_svc.parse_date(to)
+    try:
+        chunks = export_svc.export_ledger(format, from_date, to_date, scope, category)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = f"carbon_ledger_{from_date.isoformat()}_{to_date.isoformat()}.{format}"
+    return StreamingResponse(
+        chunks,
+        media_type=export_svc.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _annotate_hotspots(dimension: str, hs: list[dict]) -> list[dict]:
+    computed_at = dt.datetime.now(dt.timezone.utc).isoformat()
+    for r in hs:
+        r["explanation"] = carbon_svc.explain_hotspot(dimension, r["key"], r)
+        r["computed_at"] = computed_at
+    return hs
+
+
+def _hotspots_watermark(db: Session) -> str:
+    return f"{freshness_svc.ledger_watermark(db)}|{hotspot_refresh_svc.refresh_token(db)}"
+
+
+async def _hotspots_watermark_async(session: AsyncSession) -> str:
+    ledger = await freshness_svc.ledger_watermark_async(session)
+    return f"{ledger}|{await hotspot_refresh_svc.refresh_token_async(session)}"
 
 
 @app.get("/hotspots")
-def hotspots(
+async def hotspots(
+    request: Request,
     dimension: str = Query(..., pattern="^(supplier|lane|sku|facility)$"),
     from_: str = Query(..., alias="from"),
     to: str = Query(...),
     limit: int = Query(20, ge=1, le=200),
-    db: Session = Depends(get_db),
+    approx: bool = Query(False),
 ):
     from_date = carbon_svc.parse_date(from_)
     to_date = carbon_svc.parse_date(to)
-    hs = carbon_svc.compute_hotspots(db, dimension, from_date, to_date, limit)
-    for r in hs:
-        r["explanation"] = carbon_svc.explain_hotspot(dimension, r["key"], r)
-        r["computed_at"] = dt.datetime.now(dt.timezone.utc).isoformat()
-    return {"items": hs}
+
+    def _compute(db: Session) -> dict:
+        if approx:
+            # Merged per-day/per-month heavy-hitter sketches; each item carries its error bound.
+            result = hotspot_sketches_svc.approx_hotspots(db, dimension, from_date, to_date, limit)
+            if result is not None:
+                items, meta = result
+                return {"items": _annotate_hotspots(dimension, items), "approx": meta}
+        # Standard windows (7d/30d/90d/FY) are served from the refreshed hotspot_aggregates.
+        stored = hotspot_refresh_svc.stored_hotspots(db, dimension, from_date, to_date, limit)
+        if stored is not None:
+            return {"items": stored}
+        hs = carbon_svc.compute_hotspots(db, dimension, from_date, to_date, limit)
+        return {"items": _annotate_hotspots(dimension, hs)}
+
+    async def _compute_native(session: AsyncSession) -> dict:
+        if approx:
+            result = await hotspot_sketches_svc.approx_hotspots_async(session, dimension, from_date, to_date, limit)
+            if result is not None:
+                items, meta = result
+                return {"items": _annotate_hotspots(dimension, items), "approx": meta}
+        stored = await hotspot_refresh_svc.stored_hotspots_async(session, dimension, from_date, to_date, limit)
+        if stored is not None:
+            return {"items": stored}
+        hs = await carbon_svc.compute_hotspots_async(session, dimension, from_date, to_date, limit)
+        return {"items": _annotate_hotspots(dimension, hs)}
+
+    return await _cached_json(
+        request,
+        "hotspots",
+        {"dimension": dimension, "from": from_date, "to": to_date, "limit": limit, "approx": approx},
+        _compute,
+        watermark=_hotspots_watermark,
+        native=_compute_native,
+        native_watermark=_hotspots_watermark_async,
+    )
+
+
+@app.get("/hotspots/all")
+async def hotspots_all(
+    request: Request,
+    from_: str = Query(..., alias="from"),
+    to: str = Query(...),
+    limit: int = Query(20, ge=1, le=200),
+    supplier_limit: int | None = Query(None, ge=1, le=200),
+    lane_limit: int | None = Query(None, ge=1, le=200),
+    sku_limit: int | None = Query(None, ge=1, le=200),
+    facility_limit: int | None = Query(None, ge=1, le=200),
+):
+    # Every dimension's top-K from a single scan; per-dimension limits default to `limit`.
+    from_date = carbon_svc.parse_date(from_)
+    to_date = carbon_svc.parse_date(to)
+    overrides = {"supplier": supplier_limit, "lane": lane_limit, "sku": sku_limit, "facility": facility_limit}
+    limits = {d: overrides[d] or limit for d in carbon_svc.HOTSPOT_DIMENSIONS}
+
+    def _compute(db: Session) -> dict:
+        items = carbon_svc.compute_all_hotspots(db, from_date, to_date, limits)
+        return {"items": {d: _annotate_hotspots(d, hs) for d, hs in items.items()}}
+
+    return await _cached_json(
+        request,
+        "hotspots_all",
+        {"from": from_date, "to": to_date, **{f"{d}_limit": n for d, n in limits.items()}},
+        _compute,
+    )
 
 
 @app.get("/hotspots/{hotspot_id}/explain")
-def hotspot_explain(hotspot_id: str) -> dict:
-    # hotspot_id format: dimension:key
-    if ":" not in hotspot_id:
-        raise HTTPException(status_code=400, detail="Invalid hotspot_id format")
-    dimension, key = hotspot_id.split(":", 1)
-    record = {"contribution_pct": 0.0}
-    explanation = carbon_svc.explain_hotspot(dimension, key, record)
-    return {"hotspot_id": hotspot_id, "dimension": dimension, "key": key, "explanation": explanation}
+async def hotspot_explain(
+    hotspot_id: str,
+    window: str = Query("30d", pattern="^(7d|30d|90d|fy)$"),
+    from_: str | None = Query(None, alias="from"),
+    to: str | None = Query(None),
+    top_activities: int = Query(5, ge=0, le=50),
+) -> dict:
+    # hotspot_id format: dimension:key. from/to override the named window.
+    from_date = carbon_svc.parse_date(from_) if from_ else None
+    to_date = carbon_svc.parse_date(to) if to else None
+    if (from_date is None) != (to_date is None):
+        raise HTTPException(status_code=400, detail="from and to must be given together")
+    try:
+        return await run_db(
+            hotspot_refresh_svc.hotspot_detail, hotspot_id, window, from_date, to_date, top_activities
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _canonical_request(req: dict) -> tuple[str, dt.date, dt.date]:
+    # Equivalent payloads hash alike: window dates normalised to ISO, keys sorted.
+    tw = req["time_window"]
+    from_date, to_date = scenario_svc.parse_date(tw["from"]), scenario_svc.parse_date(tw["to"])
+    canonical = {**req, "time_window": {**tw, "from": from_date.isoformat(), "to": to_date.isoformat()}}
+    return hashlib.sha256(orjson.dumps(canonical, option=orjson.OPT_SORT_KEYS)).hexdigest(), from_date, to_date
+
+
+async def _memoized(
+    request: Request,
+    endpoint: str,
+    req: dict,
+    fn: Callable[[Session, dict], dict],
+    model: type[BaseModel],
+    native: Callable[[AsyncSession, dict], Awaitable[dict]] | None = None,
+):
+    # Cached until a ledger month overlapping the request's window is written.
+    try:
+        key, from_date, to_date = _canonical_request(req)
+        return await _cached_json(
+            request,
+            endpoint,
+            {"request": key},
+            lambda db: fn(db, req),
+            model,
+            cache=scenario_cache,
+            watermark=lambda db: freshness_svc.window_watermark(db, from_date, to_date),
+            native=(lambda session: native(session, req)) if native is not None else None,
+            native_watermark=lambda session: freshness_svc.window_watermark_async(session, from_date, to_date),
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        # Malformed payloads (missing keys, wrong types) are client errors, as in the batch.
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/simulate", response_model=ScenarioResponse)
-def simulate(req: ScenarioRequest, db: Session = Depends(get_db)):
+async def simulate(request: Request, req: ScenarioRequest):
+    return await _memoized(
+        request, "simulate", req.model_dump(), scenario_svc.simulate, ScenarioResponse, scenario_svc.simulate_async
+    )
+
+
+@app.post("/simulate/batch", response_model=ScenarioBatchResponse)
+async def simulate_batch(req: ScenarioBatchRequest):
+    # Explicit scenarios first, then the sweep's combinations; items keep that order.
+    reqs = [s.model_dump() for s in req.scenarios]
     try:
-        return scenario_svc.simulate(db, req.model_dump())
+        if req.sweep is not None:
+            reqs += scenario_svc.expand_sweep(req.sweep.base.model_dump(), req.sweep.vary)
+        results = await run_db(scenario_svc.simulate_batch, reqs)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    items = [{"index": i, "parameters": r["parameters"], **res} for i, (r, res) in enumerate(zip(reqs, results))]
+    return {"count": len(items), "failed": sum(1 for it in items if it["error"]), "items": items}
 
 
 @app.post("/optimize", response_model=OptimizeResponse)
-def optimize(req: OptimizeRequest, db: Session = Depends(get_db)):
-    return optimizer_svc.optimize(db, req.model_dump())
+async def optimize(request: Request, req: OptimizeRequest):
+    return await _memoized(request, "optimize", req.model_dump(), optimizer_svc.optimize, OptimizeResponse)
 
 
 @app.post("/report/generate", response_model=ReportArtifactModel)
-def report_generate(req: ReportGenerateRequest, db: Session = Depends(get_db)):
-    return reports_svc.generate_report(db, req.time_window)
+async def report_generate(req: ReportGenerateRequest):
+    # Every call persists a new artifact (its own report_id and created_at); only the
+    # report body, a pure read of the ledger, is cached under the ledger watermark.
+    tw = req.time_window
+    from_date, to_date = carbon_svc.parse_date(tw["from"]), carbon_svc.parse_date(tw["to"])
+
+    def _generate(db: Session) -> dict:
+        if not settings.response_cache_enabled:
+            return reports_svc.generate_report(db, tw)
+        key = ("report_content", from_date, to_date, freshness_svc.ledger_watermark(db))
+        entry = response_cache.get(key)
+        if entry is None:
+            content = reports_svc.report_content(db, from_date, to_date)
+            entry = response_cache.put(key, content, size=len(orjson.dumps(content)))
+        return reports_svc.save_report(db, entry.value)
+
+    async def _generate_native(session: AsyncSession) -> dict:
+        if not settings.response_cache_enabled:
+            content = await reports_svc.report_content_async(session, from_date, to_date)
+            return await reports_svc.save_report_async(session, content)
+        key = ("report_content", from_date, to_date, await freshness_svc.ledger_watermark_async(session))
+        entry = response_cache.get(key)
+        if entry is None:
+            content = await reports_svc.report_content_async(session, from_date, to_date)
+            entry = response_cache.put(key, content, size=len(orjson.dumps(content)))
+        return await reports_svc.save_report_async(session, entry.value)
+
+    return await run_db(_generate, native=_generate_native)
 
 
 @app.get("/report/{report_id}", response_model=ReportArtifactModel)
-def report_get(report_id: str, db: Session = Depends(get_db)):
-    r = reports_svc.get_report(db, report_id)
+async def report_get(report_id: str):
+    r = await run_db(reports_svc.get_report, report_id)
     if not r:
         raise HTTPException(status_code=404, detail="Report not found")
     return r
@@ -93,7 +93,8 @@ class CarbonSummaryResponse(BaseModel):
     total_kg_co2e: float
     scope_split: dict[str, float]
     category_split: dict[str, float]
-    trend_daily: list[dict]  # {date, kg_co2e}
+    trend_daily: list[dict]  # {date, kg_co2e}; date is the bucket start at trend_grain
+    trend_grain: str = "day"
     coverage: dict
     freshness: dict
 
@@ -105,6 +106,9 @@ class ScenarioRequest(BaseModel):
     parameters: dict = {}
     cost_model: dict = {}
     lead_time_model: dict = {}
+    # Monte Carlo draws of the carbon delta, e.g. {"samples": 10000, "seed": 0,
+    # "sigmas": {"fallback_proxy": {"factor": 0.4, "activity": 0.2}}}; empty = point estimate only.
+    uncertainty: dict = {}
 
 
 class ScenarioResponse(BaseModel):
@@ -120,6 +124,30 @@ class ScenarioResponse(BaseModel):
     delta_lead_time_days: float
     impacted_activity_count: int
     assumptions_used: dict
+    uncertainty: dict | None = None
+
+
+class ScenarioSweep(BaseModel):
+    base: ScenarioRequest
+    vary: dict[str, list]
+
+
+class ScenarioBatchRequest(BaseModel):
+    scenarios: list[ScenarioRequest] = []
+    sweep: ScenarioSweep | None = None
+
+
+class ScenarioBatchItem(BaseModel):
+    index: int
+    parameters: dict
+    result: ScenarioResponse | None = None
+    error: str | None = None
+
+
+class ScenarioBatchResponse(BaseModel):
+    count: int
+    failed: int
+    items: list[ScenarioBatchItem]
 
 
 class OptimizeRequest(BaseModel):
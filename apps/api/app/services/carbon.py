@@ -1,67 +1,171 @@
 from __future__ import annotations
 
+import base64
 import datetime as dt
+import json
 from collections import defaultdict
 
-from sqlalchemy import func, select
+from sqlalchemy import and_, case, false, func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core.downsample import lttb
+from app.core.metrics import traced
 from app.db.models import CarbonLedgerLine
+from app.db.payloads import join_payloads, ledger_assumptions
+from app.db.session import offload
+from app.services.grain import bucket_expr, bucket_start
+from app.services.sources import AggSource, aggregate_source, aggregate_source_async
 
 
 def parse_date(s: str) -> dt.date:
     return dt.date.fromisoformat(s)
 
 
-def carbon_summary(db: Session, from_date: dt.date, to_date: dt.date) -> dict:
-    q = (
+TREND_GRAINS = ("day", "week", "month")
+
+
+def _summary_grouping_sets_query(src: AggSource, from_date: dt.date, to_date: dt.date, grain: str):
+    # One scan: GROUPING SETS computes the grand total, scope split, category split and
+    # trend together. grouping() flags which columns are rolled up in each row.
+    bucket = bucket_expr(src.period_date, grain)
+    grouping = func.grouping(src.scope, src.category, bucket)
+    return (
         select(
-            func.sum(CarbonLedgerLine.kg_co2e).label("total"),
-            func.max(CarbonLedgerLine.computed_at).label("last_computed_at"),
+            grouping.label("g"),
+            src.scope,
+            src.category,
+            bucket.label("bucket"),
+            src.kg_sum().label("kg"),
+            src.last_computed_at().label("last_computed_at"),
+            src.row_count().label("n"),
+            src.confidence_sum().label("conf_sum"),
+        )
+        .where(src.period_date >= from_date)
+        .where(src.period_date <= to_date)
+        .group_by(
+            func.grouping_sets(
+                tuple_(),
+                tuple_(src.scope),
+                tuple_(src.category),
+                tuple_(bucket),
+            )
         )
-        .where(CarbonLedgerLine.period_date >= from_date)
-        .where(CarbonLedgerLine.period_date <= to_date)
     )
-    total, last_computed_at = db.execute(q).one()
-    total = float(total or 0.0)
-
-    scope_rows = db.execute(
-        select(CarbonLedgerLine.scope, func.sum(CarbonLedgerLine.kg_co2e))
-        .where(CarbonLedgerLine.period_date >= from_date)
-        .where(CarbonLedgerLine.period_date <= to_date)
-        .group_by(CarbonLedgerLine.scope)
-    ).all()
-    scope_split = {str(scope): float(v or 0.0) for scope, v in scope_rows}
-
-    cat_rows = db.execute(
-        select(CarbonLedgerLine.category, func.sum(CarbonLedgerLine.kg_co2e))
-        .where(CarbonLedgerLine.period_date >= from_date)
-        .where(CarbonLedgerLine.period_date <= to_date)
-        .group_by(CarbonLedgerLine.category)
-    ).all()
-    category_split = {str(cat): float(v or 0.0) for cat, v in cat_rows}
-
-    daily_rows = db.execute(
-        select(CarbonLedgerLine.period_date, func.sum(CarbonLedgerLine.kg_co2e))
-        .where(CarbonLedgerLine.period_date >= from_date)
-        .where(CarbonLedgerLine.period_date <= to_date)
-        .group_by(CarbonLedgerLine.period_date)
-        .order_by(CarbonLedgerLine.period_date.asc())
-    ).all()
-    trend_daily = [{"date": d.isoformat(), "kg_co2e": float(v or 0.0)} for d, v in daily_rows]
-
-    conf_rows = db.execute(
+
+
+def _summary_grouping_sets_sections(rows: list) -> dict:
+    sections = {
+        "total": 0.0,
+        "last_computed_at": None,
+        "n": 0,
+        "avg_conf": 0.0,
+        "scope_split": {},
+        "category_split": {},
+        "trend_daily": [],
+    }
+    daily = []
+    for r in rows:
+        kg = float(r.kg or 0.0)
+        if r.g == 0b111:
+            n = int(r.n or 0)
+            sections["total"] = kg
+            sections["last_computed_at"] = r.last_computed_at
+            sections["n"] = n
+            sections["avg_conf"] = float(r.conf_sum or 0.0) / n if n else 0.0
+        elif r.g == 0b011:
+            sections["scope_split"][str(r.scope)] = kg
+        elif r.g == 0b101:
+            sections["category_split"][str(r.category)] = kg
+        elif r.g == 0b110:
+            daily.append((r.bucket, kg))
+    daily.sort(key=lambda x: x[0])
+    sections["trend_daily"] = [{"date": d.isoformat(), "kg_co2e": kg} for d, kg in daily]
+    return sections
+
+
+def _summary_folded_query(src: AggSource, from_date: dt.date, to_date: dt.date):
+    # Portable fallback for dialects without GROUPING SETS: one scan at (day, scope, category)
+    # grain, folded into the summary sections in Python. The group count is bounded by
+    # days x scopes x categories, not by ledger size.
+    return (
         select(
-            func.count().label("n"),
-            func.avg(CarbonLedgerLine.confidence).label("avg_conf"),
+            src.period_date,
+            src.scope,
+            src.category,
+            src.kg_sum().label("kg"),
+            src.last_computed_at().label("last_computed_at"),
+            src.row_count().label("n"),
+            src.confidence_sum().label("conf_sum"),
         )
-        .where(CarbonLedgerLine.period_date >= from_date)
-        .where(CarbonLedgerLine.period_date <= to_date)
-    ).one()
+        .where(src.period_date >= from_date)
+        .where(src.period_date <= to_date)
+        .group_by(src.period_date, src.scope, src.category)
+    )
 
+
+def _summary_folded_sections(rows: list, grain: str) -> dict:
+    total = 0.0
+    n = 0
+    conf_sum = 0.0
+    last_computed_at = None
+    scope_split: dict[str, float] = defaultdict(float)
+    category_split: dict[str, float] = defaultdict(float)
+    daily: dict[dt.date, float] = defaultdict(float)
+    for r in rows:
+        kg = float(r.kg or 0.0)
+        total += kg
+        n += int(r.n or 0)
+        conf_sum += float(r.conf_sum or 0.0)
+        if r.last_computed_at is not None and (last_computed_at is None or r.last_computed_at > last_computed_at):
+            last_computed_at = r.last_computed_at
+        scope_split[str(r.scope)] += kg
+        category_split[str(r.category)] += kg
+        daily[bucket_start(r.period_date, grain)] += kg
+
+    return {
+        "total": total,
+        "last_computed_at": last_computed_at,
+        "n": n,
+        "avg_conf": (conf_sum / n) if n else 0.0,
+        "scope_split": dict(scope_split),
+        "category_split": dict(category_split),
+        "trend_daily": [{"date": d.isoformat(), "kg_co2e": kg} for d, kg in sorted(daily.items())],
+    }
+
+
+def _downsample_trend(trend: list[dict], max_points: int) -> list[dict]:
+    return offload(
+        lttb, trend, max_points, x=lambda p: dt.date.fromisoformat(p["date"]).toordinal(), y=lambda p: p["kg_co2e"]
+    )
+
+
+def _summary_query(src: AggSource, dialect: str, from_date: dt.date, to_date: dt.date, grain: str):
+    if grain not in TREND_GRAINS:
+        raise ValueError("Invalid grain")
+    if dialect == "postgresql":
+        return _summary_grouping_sets_query(src, from_date, to_date, grain)
+    return _summary_folded_query(src, from_date, to_date)
+
+
+def _summary_response(
+    dialect: str, rows: list, from_date: dt.date, to_date: dt.date, grain: str, max_points: int | None
+) -> dict:
+    if dialect == "postgresql":
+        sections = _summary_grouping_sets_sections(rows)
+    else:
+        sections = _summary_folded_sections(rows, grain)
+
+    # trend_daily keeps its name for existing clients; its points are bucket starts at
+    # `grain`. max_points thins the series for charting without losing its peaks.
+    trend = sections["trend_daily"]
+    if max_points is not None:
+        trend = _downsample_trend(trend, max_points)
+
+    last_computed_at = sections["last_computed_at"]
     coverage = {
-        "activity_count": int(conf_rows.n or 0),
-        "avg_confidence": float(conf_rows.avg_conf or 0.0),
+        "activity_count": sections["n"],
+        "avg_confidence": sections["avg_conf"],
     }
 
     freshness = {
@@ -71,15 +175,105 @@ def carbon_summary(db: Session, from_date: dt.date, to_date: dt.date) -> dict:
     return {
         "period_from": from_date.isoformat(),
         "period_to": to_date.isoformat(),
-        "total_kg_co2e": total,
-        "scope_split": scope_split,
-        "category_split": category_split,
-        "trend_daily": trend_daily,
+        "total_kg_co2e": sections["total"],
+        "scope_split": sections["scope_split"],
+        "category_split": sections["category_split"],
+        "trend_daily": trend,
+        "trend_grain": grain,
         "coverage": coverage,
         "freshness": freshness,
     }
 
 
+@traced("carbon_summary")
+def carbon_summary(
+    db: Session,
+    from_date: dt.date,
+    to_date: dt.date,
+    grain: str = "day",
+    max_points: int | None = None,
+) -> dict:
+    dialect = db.get_bind().dialect.name
+    q = _summary_query(aggregate_source(db), dialect, from_date, to_date, grain)
+    return _summary_response(dialect, db.execute(q).all(), from_date, to_date, grain, max_points)
+
+
+@traced("carbon_summary")
+async def carbon_summary_async(
+    session: AsyncSession,
+    from_date: dt.date,
+    to_date: dt.date,
+    grain: str = "day",
+    max_points: int | None = None,
+) -> dict:
+    dialect = session.bind.dialect.name
+    q = _summary_query(await aggregate_source_async(session), dialect, from_date, to_date, grain)
+    return _summary_response(dialect, (await session.execute(q)).all(), from_date, to_date, grain, max_points)
+
+
+def _encode_cursor(computed_at: dt.datetime, ledger_id: str) -> str:
+    raw = json.dumps([computed_at.isoformat(), ledger_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[dt.datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        computed_at, ledger_id = json.loads(raw)
+        return dt.datetime.fromisoformat(computed_at), str(ledger_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _estimated_count(db: Session, q) -> int | None:
+    # Planner row estimate for the filtered ledger query: O(1) regardless of window size.
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    compiled = q.compile(dialect=db.get_bind().dialect)
+    plan = db.connection().exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+LEDGER_FIELDS = (
+    "ledger_id",
+    "activity_id",
+    "activity_type",
+    "scope",
+    "category",
+    "kg_co2e",
+    "method",
+    "confidence",
+    "factor_key",
+    "factor_version",
+    "lineage_json",
+    "assumptions_json",
+    "computed_at",
+    "period_date",
+    "supplier_id",
+    "lane_id",
+    "sku",
+    "facility_id",
+)
+# JSONB documents are opt-in: detoasting them dominates large pages.
+DEFAULT_LEDGER_FIELDS = tuple(f for f in LEDGER_FIELDS if f not in ("lineage_json", "assumptions_json"))
+
+_LEDGER_FIELD_FORMAT = {
+    "kg_co2e": float,
+    "confidence": float,
+    "computed_at": dt.datetime.isoformat,
+    "period_date": dt.date.isoformat,
+}
+
+
+def _ledger_field_expr(field: str):
+    if field == "assumptions_json":
+        return ledger_assumptions().label(field)
+    return getattr(CarbonLedgerLine, field)
+
+
+@traced("list_ledger")
 def list_ledger(
     db: Session,
     from_date: dt.date,
@@ -88,132 +282,262 @@ def list_ledger(
     category: str | None,
     limit: int,
     offset: int,
+    cursor: str | None = None,
+    include_total: bool = True,
+    fields: list[str] | None = None,
 ) -> dict:
-    q = select(CarbonLedgerLine).where(CarbonLedgerLine.period_date >= from_date).where(
-        CarbonLedgerLine.period_date <= to_date
-    )
+    fields = list(fields or DEFAULT_LEDGER_FIELDS)
+    unknown = [f for f in fields if f not in LEDGER_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+
+    filters = [CarbonLedgerLine.period_date >= from_date, CarbonLedgerLine.period_date <= to_date]
     if scope is not None:
-        q = q.where(CarbonLedgerLine.scope == scope)
+        filters.append(CarbonLedgerLine.scope == scope)
     if category:
-        q = q.where(CarbonLedgerLine.category == category)
+        filters.append(CarbonLedgerLine.category == category)
 
-    total = db.execute(select(func.count()).select_from(q.subquery())).scalar_one()
-    rows = db.execute(
-        q.order_by(CarbonLedgerLine.computed_at.desc()).limit(limit).offset(offset)
-    ).scalars().all()
+    if include_total:
+        total = int(db.execute(select(func.count()).select_from(CarbonLedgerLine).where(*filters)).scalar_one())
+        total_estimated = None
+    else:
+        total = None
+        total_estimated = _estimated_count(db, select(CarbonLedgerLine.ledger_id).where(*filters))
 
-    items = []
-    for r in rows:
-        items.append(
-            {
-                "ledger_id": r.ledger_id,
-                "activity_id": r.activity_id,
-                "activity_type": r.activity_type,
-                "scope": r.scope,
-                "category": r.category,
-                "kg_co2e": float(r.kg_co2e),
-                "method": r.method,
-                "confidence": float(r.confidence),
-                "factor_key": r.factor_key,
-                "factor_version": r.factor_version,
-                "lineage_json": r.lineage_json,
-                "assumptions_json": r.assumptions_json,
-                "computed_at": r.computed_at.isoformat(),
-                "period_date": r.period_date.isoformat(),
-                "supplier_id": r.supplier_id,
-                "lane_id": r.lane_id,
-                "sku": r.sku,
-                "facility_id": r.facility_id,
-            }
+    # Core select of just the requested columns: no ORM identity map, and JSONB is only
+    # read when asked for. The keyset columns always come along for the cursor.
+    page = select(*(_ledger_field_expr(f) for f in fields)).select_from(CarbonLedgerLine).where(*filters)
+    keyset = [k for k in ("computed_at", "ledger_id") if k not in fields]
+    page = page.add_columns(*(getattr(CarbonLedgerLine, k) for k in keyset))
+    if "assumptions_json" in fields:
+        page = join_payloads(page)
+
+    # Keyset pagination on (computed_at, ledger_id): each page is an index range scan
+    # from the cursor position instead of skipping `offset` rows.
+    if cursor:
+        if offset:
+            raise ValueError("cursor and offset cannot be combined")
+        after_computed_at, after_ledger_id = _decode_cursor(cursor)
+        page = page.where(
+            tuple_(CarbonLedgerLine.computed_at, CarbonLedgerLine.ledger_id) < tuple_(after_computed_at, after_ledger_id)
         )
+    page = page.order_by(CarbonLedgerLine.computed_at.desc(), CarbonLedgerLine.ledger_id.desc()).limit(limit + 1)
+    if offset:
+        page = page.offset(offset)
+    rows = db.execute(page).all()
 
-    return {"total": int(total), "items": items, "limit": limit, "offset": offset}
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].computed_at, rows[-1].ledger_id)
 
+    fmt = [(f, _LEDGER_FIELD_FORMAT.get(f)) for f in fields]
+    items = [
+        {f: (conv(v) if conv is not None and v is not None else v) for (f, conv), v in zip(fmt, r)} for r in rows
+    ]
 
-def compute_hotspots(
-    db: Session,
+    return {
+        "total": total,
+        "total_estimated": total_estimated,
+        "items": items,
+        "limit": limit,
+        "offset": offset,
+        "next_cursor": next_cursor,
+    }
+
+
+def _trend_windows(from_date: dt.date, to_date: dt.date) -> tuple[dt.date, dt.date, dt.date, dt.date]:
+    # Trend delta: compare last 7 days of window vs previous 7 days (bounded).
+    end = to_date
+    w1_from = max(from_date, end - dt.timedelta(days=6))
+    w1_to = end
+    w0_to = w1_from - dt.timedelta(days=1)
+    w0_from = max(from_date, w0_to - dt.timedelta(days=6))
+    return w1_from, w1_to, w0_from, w0_to
+
+
+def _trend_conditions(src: AggSource, from_date: dt.date, to_date: dt.date):
+    w1_from, w1_to, w0_from, w0_to = _trend_windows(from_date, to_date)
+    w1 = and_(src.period_date >= w1_from, src.period_date <= w1_to)
+    w0 = and_(src.period_date >= w0_from, src.period_date <= w0_to) if w0_from <= w0_to else false()
+    return w1, w0
+
+
+def _trend_delta(w1: float, w0: float) -> float:
+    return ((w1 - w0) / w0 * 100.0) if w0 > 0 else (100.0 if w1 > 0 else 0.0)
+
+
+def _hotspot_record(
     dimension: str,
+    key: str,
     from_date: dt.date,
     to_date: dt.date,
-    limit: int,
-) -> list[dict]:
-    dim_col = {
-        "supplier": CarbonLedgerLine.supplier_id,
-        "lane": CarbonLedgerLine.lane_id,
-        "sku": CarbonLedgerLine.sku,
-        "facility": CarbonLedgerLine.facility_id,
-    }.get(dimension)
+    kg: float,
+    n: int,
+    total_kg: float,
+    w1: float,
+    w0: float,
+) -> dict:
+    return {
+        "hotspot_id": f"{dimension}:{key}",
+        "dimension": dimension,
+        "key": key,
+        "period_from": from_date.isoformat(),
+        "period_to": to_date.isoformat(),
+        "kg_co2e_total": kg,
+        "activity_count": n,
+        "contribution_pct": (kg / total_kg * 100.0) if total_kg > 0 else 0.0,
+        "trend_delta_pct": _trend_delta(w1, w0),
+    }
+
+
+def _hotspots_query(src: AggSource, dimension: str, from_date: dt.date, to_date: dt.date, limit: int):
+    dim_col = src.dim(dimension)
     if dim_col is None:
         raise ValueError("Invalid dimension")
 
-    base = (
+    # One conditional-aggregation pass: per-key totals and both trend windows, plus the
+    # window total as a window function over the grouped rows (NULL keys included, as
+    # they still count towards contribution_pct).
+    w1, w0 = _trend_conditions(src, from_date, to_date)
+    grouped = (
         select(
             dim_col.label("k"),
-            func.sum(CarbonLedgerLine.kg_co2e).label("kg"),
-            func.count().label("n"),
+            src.kg_sum().label("kg"),
+            src.row_count().label("n"),
+            src.kg_sum(w1).label("w1"),
+            src.kg_sum(w0).label("w0"),
+            func.sum(src.kg_sum()).over().label("total_kg"),
         )
-        .where(CarbonLedgerLine.period_date >= from_date)
-        .where(CarbonLedgerLine.period_date <= to_date)
-        .where(dim_col.is_not(None))
+        .where(src.period_date >= from_date)
+        .where(src.period_date <= to_date)
         .group_by(dim_col)
-        .order_by(func.sum(CarbonLedgerLine.kg_co2e).desc())
-        .limit(limit)
+        .subquery()
     )
-    rows = db.execute(base).all()
+    return select(grouped).where(grouped.c.k.is_not(None)).order_by(grouped.c.kg.desc()).limit(limit)
 
-    total_kg = db.execute(
-        select(func.sum(CarbonLedgerLine.kg_co2e))
-        .where(CarbonLedgerLine.period_date >= from_date)
-        .where(CarbonLedgerLine.period_date <= to_date)
-    ).scalar_one()
-    total_kg = float(total_kg or 0.0)
 
-    # Trend delta: compare last 7 days of window vs previous 7 days (bounded).
-    end = to_date
-    w1_from = max(from_date, end - dt.timedelta(days=6))
-    w1_to = end
-    w0_to = w1_from - dt.timedelta(days=1)
-    w0_from = max(from_date, w0_to - dt.timedelta(days=6))
+def _hotspot_records(dimension: str, from_date: dt.date, to_date: dt.date, rows: list) -> list[dict]:
+    return [
+        _hotspot_record(
+            dimension,
+            str(r.k),
+            from_date,
+            to_date,
+            float(r.kg or 0.0),
+            int(r.n or 0),
+            float(r.total_kg or 0.0),
+            float(r.w1 or 0.0),
+            float(r.w0 or 0.0),
+        )
+        for r in rows
+    ]
 
-    def _window_sum(f: dt.date, t: dt.date, key: str) -> float:
-        if f > t:
-            return 0.0
-        return float(
-            db.execute(
-                select(func.sum(CarbonLedgerLine.kg_co2e))
-                .where(CarbonLedgerLine.period_date >= f)
-                .where(CarbonLedgerLine.period_date <= t)
-                .where(dim_col == key)
-            ).scalar_one()
-            or 0.0
+
+@traced("compute_hotspots")
+def compute_hotspots(
+    db: Session,
+    dimension: str,
+    from_date: dt.date,
+    to_date: dt.date,
+    limit: int,
+) -> list[dict]:
+    q = _hotspots_query(aggregate_source(db), dimension, from_date, to_date, limit)
+    return _hotspot_records(dimension, from_date, to_date, db.execute(q).all())
+
+
+@traced("compute_hotspots")
+async def compute_hotspots_async(
+    session: AsyncSession,
+    dimension: str,
+    from_date: dt.date,
+    to_date: dt.date,
+    limit: int,
+) -> list[dict]:
+    q = _hotspots_query(await aggregate_source_async(session), dimension, from_date, to_date, limit)
+    return _hotspot_records(dimension, from_date, to_date, (await session.execute(q)).all())
+
+
+HOTSPOT_DIMENSIONS = ("supplier", "lane", "sku", "facility")
+LEDGER_DIMENSIONS = {
+    "supplier": CarbonLedgerLine.supplier_id,
+    "lane": CarbonLedgerLine.lane_id,
+    "sku": CarbonLedgerLine.sku,
+    "facility": CarbonLedgerLine.facility_id,
+}
+
+
+def _all_hotspots_grouping_sets(
+    db: Session, src: AggSource, from_date: dt.date, to_date: dt.date, limits: dict[str, int]
+) -> dict[str, list[dict]]:
+    # One scan for every dimension: a grouping set per dimension plus () for the window
+    # total. grouping() tells the sets apart; row_number() ranks keys within each set so
+    # the per-dimension top-K is cut in SQL.
+    dims = [src.dim(d) for d in HOTSPOT_DIMENSIONS]
+    grouping = func.grouping(*dims)
+    # Bit i (from the left) is 0 when dimension i is the grouped column of the row.
+    codes = {d: 0b1111 ^ (0b1000 >> i) for i, d in enumerate(HOTSPOT_DIMENSIONS)}
+    total_code = 0b1111
+
+    w1, w0 = _trend_conditions(src, from_date, to_date)
+    grouped = (
+        select(
+            grouping.label("g"),
+            func.coalesce(*dims).label("k"),
+            src.kg_sum().label("kg"),
+            src.row_count().label("n"),
+            src.kg_sum(w1).label("w1"),
+            src.kg_sum(w0).label("w0"),
         )
+        .where(src.period_date >= from_date)
+        .where(src.period_date <= to_date)
+        .group_by(func.grouping_sets(tuple_(), *(tuple_(c) for c in dims)))
+        .subquery()
+    )
+    ranked = select(
+        grouped,
+        func.row_number().over(partition_by=grouped.c.g, order_by=(grouped.c.kg.desc(), grouped.c.k)).label("rn"),
+    ).where(or_(grouped.c.k.is_not(None), grouped.c.g == total_code))
+    ranked = ranked.subquery()
+    limit_for = case({codes[d]: limits[d] for d in HOTSPOT_DIMENSIONS}, value=ranked.c.g, else_=1)
+    rows = db.execute(select(ranked).where(ranked.c.rn <= limit_for).order_by(ranked.c.g, ranked.c.rn)).all()
 
-    out = []
-    for k, kg, n in rows:
-        k = str(k)
-        kg = float(kg or 0.0)
-        n = int(n or 0)
-        pct = (kg / total_kg * 100.0) if total_kg > 0 else 0.0
-        w1 = _window_sum(w1_from, w1_to, k)
-        w0 = _window_sum(w0_from, w0_to, k)
-        delta = ((w1 - w0) / w0 * 100.0) if w0 > 0 else (100.0 if w1 > 0 else 0.0)
-
-        out.append(
-            {
-                "hotspot_id": f"{dimension}:{k}",
-                "dimension": dimension,
-                "key": k,
-                "period_from": from_date.isoformat(),
-                "period_to": to_date.isoformat(),
-                "kg_co2e_total": kg,
-                "activity_count": n,
-                "contribution_pct": pct,
-                "trend_delta_pct": delta,
-            }
+    total_kg = next((float(r.kg or 0.0) for r in rows if r.g == total_code), 0.0)
+    by_code = {code: d for d, code in codes.items()}
+    out: dict[str, list[dict]] = {d: [] for d in HOTSPOT_DIMENSIONS}
+    for r in rows:
+        dimension = by_code.get(r.g)
+        if dimension is None:
+            continue
+        out[dimension].append(
+            _hotspot_record(
+                dimension,
+                str(r.k),
+                from_date,
+                to_date,
+                float(r.kg or 0.0),
+                int(r.n or 0),
+                total_kg,
+                float(r.w1 or 0.0),
+                float(r.w0 or 0.0),
+            )
         )
     return out
 
 
+@traced("compute_all_hotspots")
+def compute_all_hotspots(
+    db: Session,
+    from_date: dt.date,
+    to_date: dt.date,
+    limits: dict[str, int],
+) -> dict[str, list[dict]]:
+    src = aggregate_source(db)
+    if db.get_bind().dialect.name == "postgresql":
+        return _all_hotspots_grouping_sets(db, src, from_date, to_date, limits)
+    return {d: compute_hotspots(db, d, from_date, to_date, limits[d]) for d in HOTSPOT_DIMENSIONS}
+
+
 def explain_hotspot(dimension: str, key: str, record: dict) -> str:
     base = f"This hotspot ranks high because it contributes {record['contribution_pct']:.1f}% of total emissions in the selected period."
     if dimension == "lane":
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import datetime as dt
+from collections import defaultdict
+from dataclasses import dataclass
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.core.metrics import traced
+from app.db.models import CarbonLedgerLine, ElectricityBill, Shipment
+from app.services.grain import GRAINS, bucket_expr, bucket_start
+from app.services.sources import LEDGER, AggSource, aggregate_source
+
+CUBE_DIMENSIONS = ("scope", "category", "supplier", "lane", "sku", "facility", "mode", "state")
+
+# Dimensions that live outside the ledger: mode comes from the shipment behind shipment
+# and purchased-goods lines (activity_id = shipment_id); state is the shipment's origin
+# state, or the billed facility's state for electricity lines.
+_JOINED_DIMENSIONS = {"mode", "state"}
+
+
+@dataclass(frozen=True)
+class CubePlan:
+    source: AggSource
+    joins: bool
+
+    @property
+    def name(self) -> str:
+        return self.source.name + ("+joins" if self.joins else "")
+
+    @property
+    def dimensions(self) -> set[str]:
+        native = set(CUBE_DIMENSIONS) - _JOINED_DIMENSIONS
+        return native | _JOINED_DIMENSIONS if self.joins else native
+
+
+def plan_cube(db: Session, dims: list[str]) -> CubePlan:
+    # Candidates from coarsest to finest; the first that carries every requested
+    # dimension wins. Every candidate is at day grain or finer, so any time grain can be
+    # derived from it. aggregate_source() is the daily rollup when it is installed.
+    candidates = [CubePlan(aggregate_source(db), joins=False), CubePlan(LEDGER, joins=True)]
+    wanted = set(dims)
+    return next(p for p in candidates if wanted <= p.dimensions)
+
+
+def _dim_columns(src: AggSource) -> dict[str, ColumnElement]:
+    cols = {
+        "scope": src.scope,
+        "category": src.category,
+        "supplier": src.supplier_id,
+        "lane": src.lane_id,
+        "sku": src.sku,
+        "facility": src.facility_id,
+    }
+    # Only resolvable when the plan joins the activity tables (see plan_cube).
+    cols["mode"] = Shipment.mode
+    cols["state"] = func.coalesce(Shipment.origin_state, ElectricityBill.state)
+    return cols
+
+
+def _cube_rows(
+    db: Session, plan: CubePlan, dims: list[str], grain: str, from_date: dt.date, to_date: dt.date, limit: int
+) -> list[tuple]:
+    src = plan.source
+    cols = _dim_columns(src)
+    dim_cols = [cols[d].label(d) for d in dims]
+    postgres = db.get_bind().dialect.name == "postgresql"
+    # Non-Postgres dialects group at day grain and fold into buckets in Python.
+    period = (bucket_expr(src.period_date, grain) if postgres else src.period_date).label("period")
+
+    q = select(period, *dim_cols, src.kg_sum().label("kg"), src.row_count().label("n")).select_from(src.table)
+    if plan.joins:
+        q = q.outerjoin(
+            Shipment,
+            and_(
+                Shipment.shipment_id == CarbonLedgerLine.activity_id,
+                CarbonLedgerLine.activity_type.in_(["shipment", "purchased_goods"]),
+            ),
+        ).outerjoin(
+            ElectricityBill,
+            and_(
+                ElectricityBill.bill_id == CarbonLedgerLine.activity_id,
+                CarbonLedgerLine.activity_type == "electricity_bill",
+            ),
+        )
+    q = (
+        q.where(src.period_date >= from_date)
+        .where(src.period_date <= to_date)
+        .group_by(period, *dim_cols)
+    )
+    if postgres:
+        # Bucketed in SQL, so ordering and the row cap (+1 to detect truncation) are too.
+        q = q.order_by(period, *dim_cols).limit(limit + 1)
+    rows = db.execute(q).all()
+    if postgres or grain == "day":
+        return [(r.period, tuple(getattr(r, d) for d in dims), float(r.kg or 0.0), int(r.n or 0)) for r in rows]
+
+    folded: dict[tuple, list] = defaultdict(lambda: [0.0, 0])
+    for r in rows:
+        acc = folded[(bucket_start(r.period, grain), tuple(getattr(r, d) for d in dims))]
+        acc[0] += float(r.kg or 0.0)
+        acc[1] += int(r.n or 0)
+    return [(p, key, kg, n) for (p, key), (kg, n) in folded.items()]
+
+
+@traced("carbon_cube")
+def carbon_cube(
+    db: Session,
+    dims: list[str],
+    grain: str,
+    from_date: dt.date,
+    to_date: dt.date,
+    limit: int = 5000,
+) -> dict:
+    unknown = [d for d in dims if d not in CUBE_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown dimension(s): {', '.join(unknown)}")
+    if len(set(dims)) != len(dims):
+        raise ValueError("Duplicate dimension")
+    if grain not in GRAINS:
+        raise ValueError("Invalid grain")
+
+    plan = plan_cube(db, dims)
+    rows = _cube_rows(db, plan, dims, grain, from_date, to_date, limit)
+    if db.get_bind().dialect.name != "postgresql":
+        rows.sort(key=lambda r: (r[0], tuple("" if v is None else str(v) for v in r[1])))
+    truncated = len(rows) > limit
+    return {
+        "period_from": from_date.isoformat(),
+        "period_to": to_date.isoformat(),
+        "grain": grain,
+        "dims": dims,
+        "source": plan.name,
+        "truncated": truncated,
+        "rows": [
+            {"period": p.isoformat(), **dict(zip(dims, key)), "kg_co2e": kg, "activity_count": n}
+            for p, key, kg, n in rows[:limit]
+        ],
+    }
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import csv
+import datetime as dt
+import io
+import logging
+import time
+from collections.abc import Iterator
+
+import orjson
+from sqlalchemy import Text, cast, select
+
+from app.db.engine import RequestSessionLocal
+from app.db.models import CarbonLedgerLine
+from app.db.payloads import join_payloads, ledger_assumptions
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+EXPORT_COLUMNS = [
+    "ledger_id",
+    "activity_id",
+    "activity_type",
+    "scope",
+    "category",
+    "kg_co2e",
+    "method",
+    "confidence",
+    "factor_key",
+    "factor_version",
+    "lineage_json",
+    "assumptions_json",
+    "computed_at",
+    "period_date",
+    "supplier_id",
+    "lane_id",
+    "sku",
+    "facility_id",
+]
+
+_JSON_COLUMNS = {"lineage_json", "assumptions_json"}
+
+
+def _export_query(from_date: dt.date, to_date: dt.date, scope: int | None, category: str | None):
+    # JSONB columns come back as text: they are written out verbatim, which skips a
+    # parse + re-serialize round trip per row. Interned assumptions are joined back in.
+    json_exprs = {"lineage_json": CarbonLedgerLine.lineage_json, "assumptions_json": ledger_assumptions()}
+    cols = [
+        cast(json_exprs[c], Text).label(c) if c in _JSON_COLUMNS else getattr(CarbonLedgerLine, c)
+        for c in EXPORT_COLUMNS
+    ]
+    q = (
+        join_payloads(select(*cols).select_from(CarbonLedgerLine))
+        .where(CarbonLedgerLine.period_date >= from_date)
+        .where(CarbonLedgerLine.period_date <= to_date)
+    )
+    if scope is not None:
+        q = q.where(CarbonLedgerLine.scope == scope)
+    if category:
+        q = q.where(CarbonLedgerLine.category == category)
+    return q
+
+
+def _iter_batches(
+    from_date: dt.date,
+    to_date: dt.date,
+    scope: int | None,
+    category: str | None,
+    batch_size: int,
+) -> Iterator[list]:
+    # The export owns its session: a streaming response outlives the request-scoped
+    # get_db session. yield_per turns on a server-side cursor so only one batch of
+    # rows is ever held in memory.
+    started = time.perf_counter()
+    n = 0
+    with RequestSessionLocal() as db:
+        result = db.execute(
+            _export_query(from_date, to_date, scope, category).execution_options(yield_per=batch_size)
+        )
+        for batch in result.partitions():
+            n += len(batch)
+            yield batch
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "ledger export %s..%s: %d rows in %.2fs (%.0f rows/s)",
+        from_date,
+        to_date,
+        n,
+        elapsed,
+        n / elapsed if elapsed > 0 else 0.0,
+    )
+
+
+def _ndjson_row(row) -> bytes:
+    d = dict(zip(EXPORT_COLUMNS, row))
+    for c in _JSON_COLUMNS:
+        if d[c] is not None:
+            d[c] = orjson.Fragment(d[c])
+    return orjson.dumps(d)
+
+
+def _ndjson_chunks(batches: Iterator[list]) -> Iterator[bytes]:
+    for batch in batches:
+        yield b"".join(_ndjson_row(row) + b"\n" for row in batch)
+
+
+def _csv_value(v):
+    if v is None:
+        return ""
+    if isinstance(v, (dt.date, dt.datetime)):
+        return v.isoformat()
+    return v
+
+
+def _csv_chunks(batches: Iterator[list]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        for row in batch:
+            w.writerow([_csv_value(v) for v in row])
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate(0)
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def _arrow_chunks(batches: Iterator[list]) -> Iterator[bytes]:
+    import pyarrow as pa
+
+    schema = pa.schema(
+        [
+            ("ledger_id", pa.string()),
+            ("activity_id", pa.string()),
+            ("activity_type", pa.string()),
+            ("scope", pa.int32()),
+            ("category", pa.string()),
+            ("kg_co2e", pa.float64()),
+            ("method", pa.string()),
+            ("confidence", pa.float64()),
+            ("factor_key", pa.string()),
+            ("factor_version", pa.string()),
+            ("lineage_json", pa.string()),
+            ("assumptions_json", pa.string()),
+            ("computed_at", pa.timestamp("us", tz="UTC")),
+            ("period_date", pa.date32()),
+            ("supplier_id", pa.string()),
+            ("lane_id", pa.string()),
+            ("sku", pa.string()),
+            ("facility_id", pa.string()),
+        ]
+    )
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            cols = list(zip(*batch)) if batch else [[] for _ in EXPORT_COLUMNS]
+            arrays = []
+            for name, values in zip(EXPORT_COLUMNS, cols):
+                arrays.append(pa.array(values, type=schema.field(name).type))
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate(0)
+    yield sink.getvalue()
+
+
+def export_ledger(
+    fmt: str,
+    from_date: dt.date,
+    to_date: dt.date,
+    scope: int | None,
+    category: str | None,
+    batch_size: int = 5000,
+) -> Iterator[bytes]:
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError("Unsupported export format")
+    if fmt == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ValueError("Arrow export requires pyarrow") from e
+
+    batches = _iter_batches(from_date, to_date, scope, category, batch_size)
+    if fmt == "ndjson":
+        return _ndjson_chunks(batches)
+    if fmt == "csv":
+        return _csv_chunks(batches)
+    return _arrow_chunks(batches)
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import datetime as dt
+
+from sqlalchemy import Date, cast, func, literal_column
+from sqlalchemy.sql.elements import ColumnElement
+
+GRAINS = ("day", "week", "month", "quarter", "fy")
+
+
+def bucket_start(d: dt.date, grain: str) -> dt.date:
+    if grain == "day":
+        return d
+    if grain == "week":
+        return d - dt.timedelta(days=d.weekday())
+    if grain == "month":
+        return d.replace(day=1)
+    if grain == "quarter":
+        return d.replace(month=(d.month - 1) // 3 * 3 + 1, day=1)
+    if grain == "fy":
+        # Indian financial year starting 1 April.
+        return dt.date(d.year if d.month >= 4 else d.year - 1, 4, 1)
+    raise ValueError("Invalid grain")
+
+
+def bucket_expr(col: ColumnElement, grain: str) -> ColumnElement:
+    """Postgres date_trunc bucketing matching bucket_start (ISO weeks start on Monday)."""
+    if grain == "day":
+        return col
+    if grain == "fy":
+        # Shift April to January, truncate to the year, shift back.
+        three_months = literal_column("interval '3 months'")
+        return cast(func.date_trunc("year", col - three_months) + three_months, Date)
+    if grain not in GRAINS:
+        raise ValueError("Invalid grain")
+    return cast(func.date_trunc(grain, col), Date)
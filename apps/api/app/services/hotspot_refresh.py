@@ -0,0 +1,411 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.metrics import traced
+from app.db.hotspots import hotspot_tracking_installed
+from app.db.models import CarbonLedgerLine, HotspotAggregate, HotspotDirtyKey, HotspotSketch, HotspotWindowState
+from app.services import carbon as carbon_svc
+from app.services.freshness import ledger_watermark
+from app.services.hotspot_sketches import refresh_sketches
+from app.services.sources import AggSource, aggregate_source
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant for pg_try_advisory_xact_lock, so concurrent refreshers (several API
+# processes, or API + standalone worker) never refresh the same windows at once.
+_REFRESH_LOCK_ID = 0x48535054
+
+
+def standard_windows(today: dt.date) -> dict[str, tuple[dt.date, dt.date]]:
+    # Indian financial year: 1 April - 31 March.
+    fy_start = dt.date(today.year if today.month >= 4 else today.year - 1, 4, 1)
+    return {
+        "7d": (today - dt.timedelta(days=6), today),
+        "30d": (today - dt.timedelta(days=29), today),
+        "90d": (today - dt.timedelta(days=89), today),
+        "fy": (fy_start, today),
+    }
+
+
+def _window_total(db: Session, src: AggSource, from_date: dt.date, to_date: dt.date) -> float:
+    return float(
+        db.execute(
+            select(src.kg_sum()).where(src.period_date >= from_date).where(src.period_date <= to_date)
+        ).scalar_one()
+        or 0.0
+    )
+
+
+def _key_rows(
+    db: Session,
+    src: AggSource,
+    dimension: str,
+    from_date: dt.date,
+    to_date: dt.date,
+    keys: list[str] | None,
+) -> list:
+    dim_col = src.dim(dimension)
+    w1, w0 = carbon_svc._trend_conditions(src, from_date, to_date)
+    q = (
+        select(
+            dim_col.label("k"),
+            src.kg_sum().label("kg"),
+            src.row_count().label("n"),
+            src.kg_sum(w1).label("w1"),
+            src.kg_sum(w0).label("w0"),
+        )
+        .where(src.period_date >= from_date)
+        .where(src.period_date <= to_date)
+        .where(dim_col.is_not(None))
+        .group_by(dim_col)
+    )
+    if keys is not None:
+        q = q.where(dim_col.in_(keys))
+    return db.execute(q).all()
+
+
+def _write_keys(
+    db: Session,
+    src: AggSource,
+    window_key: str,
+    from_date: dt.date,
+    to_date: dt.date,
+    total_kg: float,
+    keys: dict[str, list[str]] | None,
+    now: dt.datetime,
+) -> int:
+    # keys=None rebuilds the whole window; otherwise only the listed keys are replaced
+    # (a key whose rows all left the window is removed).
+    if keys is None:
+        db.execute(delete(HotspotAggregate).where(HotspotAggregate.window_key == window_key))
+    written = 0
+    for dimension in carbon_svc.HOTSPOT_DIMENSIONS:
+        dim_keys = None if keys is None else keys.get(dimension)
+        if keys is not None:
+            if not dim_keys:
+                continue
+            db.execute(
+                delete(HotspotAggregate)
+                .where(HotspotAggregate.window_key == window_key)
+                .where(HotspotAggregate.dimension == dimension)
+                .where(HotspotAggregate.key.in_(dim_keys))
+            )
+        records = []
+        for r in _key_rows(db, src, dimension, from_date, to_date, dim_keys):
+            rec = carbon_svc._hotspot_record(
+                dimension,
+                str(r.k),
+                from_date,
+                to_date,
+                float(r.kg or 0.0),
+                int(r.n or 0),
+                total_kg,
+                float(r.w1 or 0.0),
+                float(r.w0 or 0.0),
+            )
+            records.append(
+                {
+                    **rec,
+                    "window_key": window_key,
+                    "period_from": from_date,
+                    "period_to": to_date,
+                    "computed_at": now,
+                    "explanation": carbon_svc.explain_hotspot(dimension, rec["key"], rec),
+                }
+            )
+        if records:
+            db.execute(HotspotAggregate.__table__.insert(), records)
+        written += len(records)
+    return written
+
+
+def _rescale_contributions(db: Session, window_key: str, total_kg: float, now: dt.datetime) -> None:
+    # The window total moved, so every stored contribution_pct (and the explanation that
+    # quotes it) is restated. This reads only the aggregate table, never the ledger.
+    rows = db.execute(
+        select(
+            HotspotAggregate.hotspot_id,
+            HotspotAggregate.dimension,
+            HotspotAggregate.key,
+            HotspotAggregate.kg_co2e_total,
+        ).where(HotspotAggregate.window_key == window_key)
+    ).all()
+    params = []
+    for r in rows:
+        pct = (r.kg_co2e_total / total_kg * 100.0) if total_kg > 0 else 0.0
+        params.append(
+            {
+                "b_window_key": window_key,
+                "b_hotspot_id": r.hotspot_id,
+                "contribution_pct": pct,
+                "explanation": carbon_svc.explain_hotspot(r.dimension, r.key, {"contribution_pct": pct}),
+                "computed_at": now,
+            }
+        )
+    if params:
+        t = HotspotAggregate.__table__
+        db.execute(
+            update(t)
+            .where(t.c.window_key == bindparam("b_window_key"))
+            .where(t.c.hotspot_id == bindparam("b_hotspot_id")),
+            params,
+        )
+
+
+def _take_dirty_keys(db: Session) -> dict[str, list[str]]:
+    dirty: dict[str, list[str]] = {}
+    for dimension, key in db.execute(
+        delete(HotspotDirtyKey).returning(HotspotDirtyKey.dimension, HotspotDirtyKey.key)
+    ).all():
+        dirty.setdefault(dimension, []).append(key)
+    return dirty
+
+
+@traced("refresh_hotspots")
+def refresh_hotspots(db: Session, today: dt.date | None = None) -> dict:
+    """Bring hotspot_aggregates up to date for the standard windows.
+
+    A window is rebuilt when its bounds move (a new day) or it has never been built;
+    otherwise only the keys marked dirty by ledger writes are recomputed. Nothing is
+    read from the ledger when the ledger watermark hasn't moved since the last run.
+    """
+    conn = db.connection()
+    if conn.dialect.name == "postgresql":
+        if not conn.execute(select(func.pg_try_advisory_xact_lock(_REFRESH_LOCK_ID))).scalar_one():
+            return {"skipped": "locked"}
+
+    today = today or dt.datetime.now(dt.timezone.utc).date()
+    now = dt.datetime.now(dt.timezone.utc)
+    src = aggregate_source(db)
+    tracked = hotspot_tracking_installed(conn)
+    watermark = ledger_watermark(db)
+    dirty = _take_dirty_keys(db) if tracked else {}
+    states = {s.window_key: s for s in db.execute(select(HotspotWindowState)).scalars().all()}
+    ledger_changed = not states or any(s.ledger_watermark != watermark for s in states.values())
+
+    report = {}
+    for window_key, (from_date, to_date) in standard_windows(today).items():
+        state = states.get(window_key)
+        bounds_moved = state is None or (state.period_from, state.period_to) != (from_date, to_date)
+        if not bounds_moved and state.ledger_watermark == watermark and not dirty:
+            report[window_key] = {"mode": "unchanged"}
+            continue
+
+        total_kg = _window_total(db, src, from_date, to_date)
+        if bounds_moved or not tracked:
+            written = _write_keys(db, src, window_key, from_date, to_date, total_kg, None, now)
+            mode = "rebuild"
+        else:
+            written = _write_keys(db, src, window_key, from_date, to_date, total_kg, dirty, now)
+            if total_kg != state.total_kg_co2e:
+                _rescale_contributions(db, window_key, total_kg, now)
+            mode = "incremental"
+
+        if state is None:
+            state = HotspotWindowState(window_key=window_key)
+            db.add(state)
+        state.period_from = from_date
+        state.period_to = to_date
+        state.total_kg_co2e = total_kg
+        state.ledger_watermark = watermark
+        state.refreshed_at = now
+        report[window_key] = {"mode": mode, "keys_written": written}
+
+    report["sketches"] = refresh_sketches(db, src, tracked, ledger_changed, now)
+
+    db.commit()
+    logger.info("hotspot refresh: %s", report)
+    return report
+
+
+_REFRESH_TOKEN = select(
+    select(func.max(HotspotWindowState.refreshed_at)).scalar_subquery(),
+    select(func.max(HotspotSketch.updated_at)).scalar_subquery(),
+)
+
+
+def _token(windows: dt.datetime | None, sketches: dt.datetime | None) -> str:
+    return f"{windows.isoformat() if windows else '-'}:{sketches.isoformat() if sketches else '-'}"
+
+
+def refresh_token(db: Session) -> str:
+    # Moves whenever the refresher rewrites a window or a sketch. Responses built from
+    # hotspot_aggregates or the sketches must key on it as well as the ledger watermark:
+    # those tables lag the ledger until the next refresh, which doesn't move the watermark.
+    return _token(*db.execute(_REFRESH_TOKEN).one())
+
+
+async def refresh_token_async(session: AsyncSession) -> str:
+    return _token(*(await session.execute(_REFRESH_TOKEN)).one())
+
+
+def _record_from_row(r: HotspotAggregate) -> dict:
+    return {
+        "hotspot_id": r.hotspot_id,
+        "dimension": r.dimension,
+        "key": r.key,
+        "period_from": r.period_from.isoformat(),
+        "period_to": r.period_to.isoformat(),
+        "kg_co2e_total": r.kg_co2e_total,
+        "activity_count": r.activity_count,
+        "contribution_pct": r.contribution_pct,
+        "trend_delta_pct": r.trend_delta_pct,
+        "explanation": r.explanation,
+        "computed_at": r.computed_at.isoformat(),
+    }
+
+
+def _window_state_query(from_date: dt.date, to_date: dt.date):
+    return (
+        select(HotspotWindowState)
+        .where(HotspotWindowState.period_from == from_date)
+        .where(HotspotWindowState.period_to == to_date)
+    )
+
+
+def _stored_query(window_key: str, dimension: str, limit: int):
+    return (
+        select(HotspotAggregate)
+        .where(HotspotAggregate.window_key == window_key)
+        .where(HotspotAggregate.dimension == dimension)
+        .order_by(HotspotAggregate.kg_co2e_total.desc())
+        .limit(limit)
+    )
+
+
+def stored_hotspots(
+    db: Session,
+    dimension: str,
+    from_date: dt.date,
+    to_date: dt.date,
+    limit: int,
+) -> list[dict] | None:
+    """Top hotspots from hotspot_aggregates when (from, to) is a refreshed standard window, else None."""
+    state = db.execute(_window_state_query(from_date, to_date)).scalars().first()
+    if state is None:
+        return None
+    rows = db.execute(_stored_query(state.window_key, dimension, limit)).scalars().all()
+    return [_record_from_row(r) for r in rows]
+
+
+async def stored_hotspots_async(
+    session: AsyncSession,
+    dimension: str,
+    from_date: dt.date,
+    to_date: dt.date,
+    limit: int,
+) -> list[dict] | None:
+    state = (await session.execute(_window_state_query(from_date, to_date))).scalars().first()
+    if state is None:
+        return None
+    rows = (await session.execute(_stored_query(state.window_key, dimension, limit))).scalars().all()
+    return [_record_from_row(r) for r in rows]
+
+
+def _top_activities(
+    db: Session, dimension: str, key: str, from_date: dt.date, to_date: dt.date, limit: int
+) -> list[dict]:
+    # Served by the ledger's per-dimension index: only this key's rows are read.
+    dim_col = carbon_svc.LEDGER_DIMENSIONS[dimension]
+    kg = func.sum(CarbonLedgerLine.kg_co2e)
+    rows = db.execute(
+        select(
+            CarbonLedgerLine.activity_id,
+            CarbonLedgerLine.activity_type,
+            kg.label("kg"),
+            func.max(CarbonLedgerLine.period_date).label("period_date"),
+        )
+        .where(dim_col == key)
+        .where(CarbonLedgerLine.period_date >= from_date)
+        .where(CarbonLedgerLine.period_date <= to_date)
+        .group_by(CarbonLedgerLine.activity_id, CarbonLedgerLine.activity_type)
+        .order_by(kg.desc(), CarbonLedgerLine.activity_id)
+        .limit(limit)
+    ).all()
+    return [
+        {
+            "activity_id": r.activity_id,
+            "activity_type": r.activity_type,
+            "kg_co2e": float(r.kg or 0.0),
+            "period_date": r.period_date.isoformat(),
+        }
+        for r in rows
+    ]
+
+
+@traced("hotspot_detail")
+def hotspot_detail(
+    db: Session,
+    hotspot_id: str,
+    window_key: str = "30d",
+    from_date: dt.date | None = None,
+    to_date: dt.date | None = None,
+    top_activities: int = 5,
+) -> dict:
+    """Real contribution, trend and top activities for one hotspot.
+
+    Standard windows are a primary-key lookup in hotspot_aggregates; any other window
+    (or a window the refresher hasn't built) falls back to a key-filtered aggregate.
+    """
+    dimension, _, key = hotspot_id.partition(":")
+    if not key or dimension not in carbon_svc.HOTSPOT_DIMENSIONS:
+        raise ValueError("Invalid hotspot_id format")
+
+    state_q = select(HotspotWindowState)
+    if from_date is not None and to_date is not None:
+        state_q = state_q.where(HotspotWindowState.period_from == from_date).where(
+            HotspotWindowState.period_to == to_date
+        )
+    else:
+        state_q = state_q.where(HotspotWindowState.window_key == window_key)
+    state = db.execute(state_q).scalars().first()
+
+    if state is not None:
+        from_date, to_date = state.period_from, state.period_to
+        row = db.get(HotspotAggregate, (state.window_key, hotspot_id))
+        if row is not None:
+            record = _record_from_row(row)
+        else:
+            # No emissions for this key in the window.
+            record = carbon_svc._hotspot_record(
+                dimension, key, from_date, to_date, 0.0, 0, state.total_kg_co2e, 0.0, 0.0
+            )
+            record["explanation"] = carbon_svc.explain_hotspot(dimension, key, record)
+            record["computed_at"] = state.refreshed_at.isoformat()
+        source = "hotspot_aggregates"
+    else:
+        if from_date is None or to_date is None:
+            windows = standard_windows(dt.datetime.now(dt.timezone.utc).date())
+            if window_key not in windows:
+                raise ValueError("Invalid window")
+            from_date, to_date = windows[window_key]
+        src = aggregate_source(db)
+        rows = _key_rows(db, src, dimension, from_date, to_date, [key])
+        r = rows[0] if rows else None
+        record = carbon_svc._hotspot_record(
+            dimension,
+            key,
+            from_date,
+            to_date,
+            float(r.kg or 0.0) if r else 0.0,
+            int(r.n or 0) if r else 0,
+            _window_total(db, src, from_date, to_date),
+            float(r.w1 or 0.0) if r else 0.0,
+            float(r.w0 or 0.0) if r else 0.0,
+        )
+        record["explanation"] = carbon_svc.explain_hotspot(dimension, key, record)
+        record["computed_at"] = dt.datetime.now(dt.timezone.utc).isoformat()
+        source = src.name
+
+    return {
+        **record,
+        "window": state.window_key if state is not None else None,
+        "source": source,
+        "top_activities": _top_activities(db, dimension, key, from_date, to_date, top_activities),
+    }
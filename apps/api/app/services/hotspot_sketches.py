@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import datetime as dt
+import itertools
+
+from sqlalchemy import and_, delete, exists, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.sketch import HeavyHitterSketch
+from app.db.models import HotspotSketch, SketchDirtyDay
+from app.db.session import offload
+from app.services import carbon as carbon_svc
+from app.services.sources import AggSource
+
+# Heavy-hitter sketches back /hotspots?approx=true. One sketch per (day, dimension) is
+# built from the rollup's exact per-day key sums; month sketches are merges of their
+# days. Any window is answered by merging whole-month sketches plus the edge days, so a
+# year costs ~12 + ~60 sketches of `hotspot_sketch_capacity` counters each.
+
+
+def _month_start(d: dt.date) -> dt.date:
+    return d.replace(day=1)
+
+
+def _next_month(d: dt.date) -> dt.date:
+    return (d.replace(day=28) + dt.timedelta(days=4)).replace(day=1)
+
+
+def _decompose(from_date: dt.date, to_date: dt.date) -> tuple[list[dt.date], list[dt.date]]:
+    days, months = [], []
+    cur = from_date
+    while cur <= to_date:
+        nxt = _next_month(cur)
+        if cur.day == 1 and nxt - dt.timedelta(days=1) <= to_date:
+            months.append(cur)
+            cur = nxt
+        else:
+            days.append(cur)
+            cur += dt.timedelta(days=1)
+    return days, months
+
+
+_ANY_DAY_SKETCH = select(exists().where(HotspotSketch.grain == "day"))
+
+
+def _build_day_sketches(db: Session, src: AggSource, days: list[dt.date] | None, now: dt.datetime) -> set[dt.date]:
+    capacity = settings.hotspot_sketch_capacity
+    day_filter = src.period_date.in_(days) if days is not None else None
+
+    stmt = delete(HotspotSketch).where(HotspotSketch.grain == "day")
+    if days is not None:
+        stmt = stmt.where(HotspotSketch.period_start.in_(days))
+    db.execute(stmt)
+
+    totals_q = select(src.period_date, src.kg_sum()).group_by(src.period_date)
+    if day_filter is not None:
+        totals_q = totals_q.where(day_filter)
+    totals = {d: float(kg or 0.0) for d, kg in db.execute(totals_q).all()}
+
+    for dimension in carbon_svc.HOTSPOT_DIMENSIONS:
+        dim_col = src.dim(dimension)
+        q = (
+            select(src.period_date, dim_col, src.kg_sum(), src.row_count())
+            .where(dim_col.is_not(None))
+            .group_by(src.period_date, dim_col)
+            .order_by(src.period_date)
+        )
+        if day_filter is not None:
+            q = q.where(day_filter)
+        # Streamed day by day: only one day's raw (key, kg) rows are held at a time. The
+        # capacity-bounded sketches of every day are kept until the insert below.
+        sketches: dict[dt.date, HeavyHitterSketch] = {}
+        for d, rows in itertools.groupby(db.execute(q.execution_options(yield_per=10_000)), key=lambda r: r[0]):
+            weights = [(str(k), float(kg or 0.0), int(n or 0)) for _, k, kg, n in rows]
+            sketches[d] = HeavyHitterSketch.from_weights(weights, capacity, totals.get(d, 0.0))
+        records = [
+            {
+                "grain": "day",
+                "period_start": d,
+                "dimension": dimension,
+                "total_kg_co2e": total,
+                "sketch_json": (sketches.get(d) or HeavyHitterSketch(capacity=capacity, total=total)).to_json(),
+                "updated_at": now,
+            }
+            for d, total in totals.items()
+        ]
+        if records:
+            db.execute(HotspotSketch.__table__.insert(), records)
+
+    return set(days) if days is not None else set(totals)
+
+
+def _build_month_sketches(db: Session, months: set[dt.date], now: dt.datetime) -> None:
+    capacity = settings.hotspot_sketch_capacity
+    for month in sorted(months):
+        month_end = _next_month(month) - dt.timedelta(days=1)
+        db.execute(
+            delete(HotspotSketch).where(HotspotSketch.grain == "month").where(HotspotSketch.period_start == month)
+        )
+        day_rows = db.execute(
+            select(HotspotSketch.dimension, HotspotSketch.sketch_json)
+            .where(HotspotSketch.grain == "day")
+            .where(HotspotSketch.period_start >= month)
+            .where(HotspotSketch.period_start <= month_end)
+        ).all()
+        per_dim: dict[str, list[HeavyHitterSketch]] = {}
+        for dimension, js in day_rows:
+            per_dim.setdefault(dimension, []).append(HeavyHitterSketch.from_json(js))
+        records = []
+        for dimension, sketches in per_dim.items():
+            merged = HeavyHitterSketch.merge(sketches, capacity)
+            records.append(
+                {
+                    "grain": "month",
+                    "period_start": month,
+                    "dimension": dimension,
+                    "total_kg_co2e": merged.total,
+                    "sketch_json": merged.to_json(),
+                    "updated_at": now,
+                }
+            )
+        if records:
+            db.execute(HotspotSketch.__table__.insert(), records)
+
+
+def refresh_sketches(db: Session, src: AggSource, tracked: bool, ledger_changed: bool, now: dt.datetime) -> dict:
+    """Rebuild day sketches for days the ledger touched, then the months containing them.
+
+    Called by the hotspot refresher inside its transaction. Without trigger tracking
+    (non-Postgres) every change rebuilds all sketches.
+    """
+    built = db.execute(_ANY_DAY_SKETCH).scalar_one()
+    if tracked and built:
+        days = [d for (d,) in db.execute(delete(SketchDirtyDay).returning(SketchDirtyDay.period_date)).all()]
+        if not days:
+            return {"days": 0, "months": 0}
+    elif not built or ledger_changed:
+        if tracked:
+            db.execute(delete(SketchDirtyDay))
+        days = None
+    else:
+        return {"days": 0, "months": 0}
+
+    if days is None:
+        db.execute(delete(HotspotSketch))
+    touched = _build_day_sketches(db, src, days, now)
+    months = {_month_start(d) for d in touched}
+    _build_month_sketches(db, months, now)
+    return {"days": len(touched), "months": len(months)}
+
+
+def _approx_plan(dimension: str, from_date: dt.date, to_date: dt.date) -> tuple:
+    """The query for a window's sketches, plus its edge days and the two trend windows' days."""
+    if dimension not in carbon_svc.HOTSPOT_DIMENSIONS:
+        raise ValueError("Invalid dimension")
+    days, months = _decompose(from_date, to_date)
+    w1_from, w1_to, w0_from, w0_to = carbon_svc._trend_windows(from_date, to_date)
+    w1_days = [w1_from + dt.timedelta(days=i) for i in range((w1_to - w1_from).days + 1)]
+    w0_days = [w0_from + dt.timedelta(days=i) for i in range((w0_to - w0_from).days + 1)] if w0_from <= w0_to else []
+    q = (
+        select(HotspotSketch.grain, HotspotSketch.period_start, HotspotSketch.sketch_json)
+        .where(HotspotSketch.dimension == dimension)
+        .where(
+            or_(
+                and_(HotspotSketch.grain == "day", HotspotSketch.period_start.in_(set(days + w1_days + w0_days))),
+                and_(HotspotSketch.grain == "month", HotspotSketch.period_start.in_(months)),
+            )
+        )
+    )
+    return q, days, w1_days, w0_days
+
+
+def _approx_result(
+    rows: list,
+    dimension: str,
+    from_date: dt.date,
+    to_date: dt.date,
+    limit: int,
+    days: list[dt.date],
+    w1_days: list[dt.date],
+    w0_days: list[dt.date],
+) -> tuple[list[dict], dict]:
+    # Pure CPU: decoding and merging the sketches.
+    capacity = settings.hotspot_sketch_capacity
+    day_sketches = {p: HeavyHitterSketch.from_json(js) for g, p, js in rows if g == "day"}
+    month_sketches = [HeavyHitterSketch.from_json(js) for g, _, js in rows if g == "month"]
+    window = HeavyHitterSketch.merge(month_sketches + [day_sketches[d] for d in days if d in day_sketches], capacity)
+    w1 = HeavyHitterSketch.merge([day_sketches[d] for d in w1_days if d in day_sketches], capacity)
+    w0 = HeavyHitterSketch.merge([day_sketches[d] for d in w0_days if d in day_sketches], capacity)
+
+    items = []
+    for key, lo, hi, n in window.top(limit):
+        # The trend compares the guaranteed (lower-bound) counts of both windows, so an
+        # overestimated window can't bias it; the interval spans the worst cases.
+        w1_lo, w1_hi = w1.estimate(key)
+        w0_lo, w0_hi = w0.estimate(key)
+        rec = carbon_svc._hotspot_record(dimension, key, from_date, to_date, hi, n, window.total, w1_lo, w0_lo)
+        rec["kg_co2e_lower"] = lo
+        rec["error_bound_kg"] = hi - lo
+        rec["trend_delta_pct_lower"] = carbon_svc._trend_delta(w1_lo, w0_hi)
+        rec["trend_delta_pct_upper"] = carbon_svc._trend_delta(w1_hi, w0_lo)
+        items.append(rec)
+    meta = {
+        "sketches": len(rows),
+        "capacity": capacity,
+        "untracked_key_max_kg": window.floor,
+        "max_error_kg": max((r["error_bound_kg"] for r in items), default=0.0),
+    }
+    return items, meta
+
+
+def approx_hotspots(
+    db: Session,
+    dimension: str,
+    from_date: dt.date,
+    to_date: dt.date,
+    limit: int,
+) -> tuple[list[dict], dict] | None:
+    """Top-K from merged sketches with per-item error bounds, or None if no sketches exist."""
+    q, days, w1_days, w0_days = _approx_plan(dimension, from_date, to_date)
+    rows = db.execute(q).all()
+    if not rows and not db.execute(_ANY_DAY_SKETCH).scalar_one():
+        return None
+    return offload(_approx_result, rows, dimension, from_date, to_date, limit, days, w1_days, w0_days)
+
+
+async def approx_hotspots_async(
+    session: AsyncSession,
+    dimension: str,
+    from_date: dt.date,
+    to_date: dt.date,
+    limit: int,
+) -> tuple[list[dict], dict] | None:
+    q, days, w1_days, w0_days = _approx_plan(dimension, from_date, to_date)
+    rows = (await session.execute(q)).all()
+    if not rows and not (await session.execute(_ANY_DAY_SKETCH)).scalar_one():
+        return None
+    return await run_in_threadpool(_approx_result, rows, dimension, from_date, to_date, limit, days, w1_days, w0_days)
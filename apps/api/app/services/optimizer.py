@@ -2,16 +2,18 @@ from __future__ import annotations
 
 import datetime as dt
 
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.db.models import CarbonLedgerLine, Shipment
+from app.core.metrics import traced
+from app.services.sources import aggregate_source
 
 
 def parse_date(s: str) -> dt.date:
     return dt.date.fromisoformat(s)
 
 
+@traced("optimize")
 def optimize(db: Session, req: dict) -> dict:
     tw = req["time_window"]
     from_date = parse_date(tw["from"])
@@ -20,14 +22,15 @@ def optimize(db: Session, req: dict) -> dict:
     constraints = req.get("constraints", {})
 
     # Baseline: top hotspot lanes by carbon.
+    src = aggregate_source(db)
     lane_rows = db.execute(
-        select(CarbonLedgerLine.lane_id, func.sum(CarbonLedgerLine.kg_co2e).label("kg"), func.count().label("n"))
-        .where(CarbonLedgerLine.activity_type == "shipment")
-        .where(CarbonLedgerLine.period_date >= from_date)
-        .where(CarbonLedgerLine.period_date <= to_date)
-        .where(CarbonLedgerLine.lane_id.is_not(None))
-        .group_by(CarbonLedgerLine.lane_id)
-        .order_by(func.sum(CarbonLedgerLine.kg_co2e).desc())
+        select(src.lane_id, src.kg_sum().label("kg"), src.row_count().label("n"))
+        .where(src.activity_type == "shipment")
+        .where(src.period_date >= from_date)
+        .where(src.period_date <= to_date)
+        .where(src.lane_id.is_not(None))
+        .group_by(src.lane_id)
+        .order_by(src.kg_sum().desc())
         .limit(5)
     ).all()
 
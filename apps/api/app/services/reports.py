@@ -3,65 +3,68 @@ from __future__ import annotations
 import datetime as dt
 import uuid
 
-from sqlalchemy import func, select
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.models import CarbonLedgerLine, ReportArtifact
+from app.core.metrics import traced
+from app.db.models import ReportArtifact
+from app.services.sources import AggSource, aggregate_source, aggregate_source_async
 
 
 def parse_date(s: str) -> dt.date:
     return dt.date.fromisoformat(s)
 
 
-def generate_report(db: Session, time_window: dict) -> dict:
-    from_date = parse_date(time_window["from"])
-    to_date = parse_date(time_window["to"])
-
-    total = float(
-        db.execute(
-            select(func.sum(CarbonLedgerLine.kg_co2e))
-            .where(CarbonLedgerLine.period_date >= from_date)
-            .where(CarbonLedgerLine.period_date <= to_date)
-        ).scalar_one()
-        or 0.0
+def _report_queries(src: AggSource, from_date: dt.date, to_date: dt.date) -> tuple:
+    """Total, scope split, category split, top lanes, top suppliers."""
+    in_window = (src.period_date >= from_date, src.period_date <= to_date)
+    return (
+        select(src.kg_sum()).where(*in_window),
+        select(src.scope, src.kg_sum()).where(*in_window).group_by(src.scope),
+        select(src.category, src.kg_sum()).where(*in_window).group_by(src.category),
+        select(src.lane_id, src.kg_sum().label("kg"))
+        .where(src.activity_type == "shipment")
+        .where(*in_window)
+        .where(src.lane_id.is_not(None))
+        .group_by(src.lane_id)
+        .order_by(src.kg_sum().desc())
+        .limit(5),
+        select(src.supplier_id, src.kg_sum().label("kg"))
+        .where(*in_window)
+        .where(src.supplier_id.is_not(None))
+        .group_by(src.supplier_id)
+        .order_by(src.kg_sum().desc())
+        .limit(5),
     )
 
-    scope_rows = db.execute(
-        select(CarbonLedgerLine.scope, func.sum(CarbonLedgerLine.kg_co2e))
-        .where(CarbonLedgerLine.period_date >= from_date)
-        .where(CarbonLedgerLine.period_date <= to_date)
-        .group_by(CarbonLedgerLine.scope)
-    ).all()
-    scope_split = {str(s): float(v or 0.0) for s, v in scope_rows}
 
-    cat_rows = db.execute(
-        select(CarbonLedgerLine.category, func.sum(CarbonLedgerLine.kg_co2e))
-        .where(CarbonLedgerLine.period_date >= from_date)
-        .where(CarbonLedgerLine.period_date <= to_date)
-        .group_by(CarbonLedgerLine.category)
-    ).all()
-    category_split = {str(c): float(v or 0.0) for c, v in cat_rows}
+@traced("report_content")
+def report_content(db: Session, from_date: dt.date, to_date: dt.date) -> dict:
+    """The report body for a window; a pure read of the ledger, so it can be cached."""
+    results = [db.execute(q).all() for q in _report_queries(aggregate_source(db), from_date, to_date)]
+    return _report_body(from_date, to_date, *results)
+
+
+@traced("report_content")
+async def report_content_async(session: AsyncSession, from_date: dt.date, to_date: dt.date) -> dict:
+    src = await aggregate_source_async(session)
+    results = [(await session.execute(q)).all() for q in _report_queries(src, from_date, to_date)]
+    return _report_body(from_date, to_date, *results)
 
-    top_lanes = db.execute(
-        select(CarbonLedgerLine.lane_id, func.sum(CarbonLedgerLine.kg_co2e).label("kg"))
-        .where(CarbonLedgerLine.activity_type == "shipment")
-        .where(CarbonLedgerLine.period_date >= from_date)
-        .where(CarbonLedgerLine.period_date <= to_date)
-        .where(CarbonLedgerLine.lane_id.is_not(None))
-        .group_by(CarbonLedgerLine.lane_id)
-        .order_by(func.sum(CarbonLedgerLine.kg_co2e).desc())
-        .limit(5)
-    ).all()
-
-    top_suppliers = db.execute(
-        select(CarbonLedgerLine.supplier_id, func.sum(CarbonLedgerLine.kg_co2e).label("kg"))
-        .where(CarbonLedgerLine.period_date >= from_date)
-        .where(CarbonLedgerLine.period_date <= to_date)
-        .where(CarbonLedgerLine.supplier_id.is_not(None))
-        .group_by(CarbonLedgerLine.supplier_id)
-        .order_by(func.sum(CarbonLedgerLine.kg_co2e).desc())
-        .limit(5)
-    ).all()
+
+def _report_body(
+    from_date: dt.date,
+    to_date: dt.date,
+    total_rows: list,
+    scope_rows: list,
+    cat_rows: list,
+    top_lanes: list,
+    top_suppliers: list,
+) -> dict:
+    total = float(total_rows[0][0] or 0.0)
+    scope_split = {str(s): float(v or 0.0) for s, v in scope_rows}
+    category_split = {str(c): float(v or 0.0) for c, v in cat_rows}
 
     annexure = {
         "totals": {"total_kg_co2e": total, "scope_split": scope_split, "category_split": category_split},
@@ -105,36 +108,17 @@ def generate_report(db: Session, time_window: dict) -> dict:
 - All numeric values are aggregated from the computed carbon ledger in Postgres.
 """
 
-    created_at = dt.datetime.now(dt.timezone.utc)
-    report = ReportArtifact(
-        report_id=str(uuid.uuid4()),
-        period_from=from_date,
-        period_to=to_date,
-        created_at=created_at,
-        narrative_md=narrative,
-        annexure_json=annexure,
-        lineage_json={"source": "postgres", "tables": ["carbon_ledger", "shipments", "suppliers", "emission_factors"]},
-        assumptions_json={"methodology": methodology},
-    )
-    db.add(report)
-    db.commit()
-
     return {
-        "report_id": report.report_id,
-        "period_from": report.period_from.isoformat(),
-        "period_to": report.period_to.isoformat(),
-        "created_at": report.created_at.isoformat(),
-        "narrative_md": report.narrative_md,
-        "annexure_json": report.annexure_json,
-        "lineage_json": report.lineage_json,
-        "assumptions_json": report.assumptions_json,
+        "period_from": from_date.isoformat(),
+        "period_to": to_date.isoformat(),
+        "narrative_md": narrative,
+        "annexure_json": annexure,
+        "lineage_json": {"source": "postgres", "tables": ["carbon_ledger", "shipments", "suppliers", "emission_factors"]},
+        "assumptions_json": {"methodology": methodology},
     }
 
 
-def get_report(db: Session, report_id: str) -> dict | None:
-    r = db.get(ReportArtifact, report_id)
-    if not r:
-        return None
+def _artifact(r: ReportArtifact) -> dict:
     return {
         "report_id": r.report_id,
         "period_from": r.period_from.isoformat(),
@@ -146,3 +130,43 @@ def get_report(db: Session, report_id: str) -> dict | None:
         "assumptions_json": r.assumptions_json,
     }
 
+
+def _new_artifact(content: dict) -> ReportArtifact:
+    return ReportArtifact(
+        report_id=str(uuid.uuid4()),
+        period_from=parse_date(content["period_from"]),
+        period_to=parse_date(content["period_to"]),
+        created_at=dt.datetime.now(dt.timezone.utc),
+        narrative_md=content["narrative_md"],
+        annexure_json=content["annexure_json"],
+        lineage_json=content["lineage_json"],
+        assumptions_json=content["assumptions_json"],
+    )
+
+
+def save_report(db: Session, content: dict) -> dict:
+    """Persist `content` (from report_content) as a new artifact."""
+    report = _new_artifact(content)
+    db.add(report)
+    db.commit()
+    return _artifact(report)
+
+
+async def save_report_async(session: AsyncSession, content: dict) -> dict:
+    report = _new_artifact(content)
+    session.add(report)
+    await session.commit()
+    return _artifact(report)
+
+
+@traced("generate_report")
+def generate_report(db: Session, time_window: dict) -> dict:
+    content = report_content(db, parse_date(time_window["from"]), parse_date(time_window["to"]))
+    return save_report(db, content)
+
+
+def get_report(db: Session, report_id: str) -> dict | None:
+    r = db.get(ReportArtifact, report_id)
+    if not r:
+        return None
+    return _artifact(r)
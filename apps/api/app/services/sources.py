@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from sqlalchemy import case, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.core.config import settings
+from app.db.models import CarbonDailyRollup, CarbonLedgerLine
+from app.db.rollup import rollup_installed
+
+# Aggregate services read either the raw ledger or the daily rollup through this
+# facade. Both expose the same key columns; only the measures differ (the rollup
+# stores pre-summed kg/count/confidence per day and key).
+
+
+@dataclass(frozen=True)
+class AggSource:
+    name: str
+    table: object
+    period_date: ColumnElement
+    scope: ColumnElement
+    category: ColumnElement
+    activity_type: ColumnElement
+    supplier_id: ColumnElement
+    lane_id: ColumnElement
+    sku: ColumnElement
+    facility_id: ColumnElement
+    kg_co2e: ColumnElement
+    confidence: ColumnElement
+    computed_at: ColumnElement
+    count_col: ColumnElement | None = None
+
+    def dim(self, dimension: str) -> ColumnElement | None:
+        return {
+            "supplier": self.supplier_id,
+            "lane": self.lane_id,
+            "sku": self.sku,
+            "facility": self.facility_id,
+        }.get(dimension)
+
+    def kg_sum(self, where: ColumnElement | None = None) -> ColumnElement:
+        if where is None:
+            return func.sum(self.kg_co2e)
+        return func.sum(case((where, self.kg_co2e), else_=0.0))
+
+    def row_count(self) -> ColumnElement:
+        if self.count_col is None:
+            return func.count()
+        return func.sum(self.count_col)
+
+    def confidence_sum(self) -> ColumnElement:
+        return func.sum(self.confidence)
+
+    def last_computed_at(self) -> ColumnElement:
+        return func.max(self.computed_at)
+
+
+LEDGER = AggSource(
+    name="ledger",
+    table=CarbonLedgerLine,
+    period_date=CarbonLedgerLine.period_date,
+    scope=CarbonLedgerLine.scope,
+    category=CarbonLedgerLine.category,
+    activity_type=CarbonLedgerLine.activity_type,
+    supplier_id=CarbonLedgerLine.supplier_id,
+    lane_id=CarbonLedgerLine.lane_id,
+    sku=CarbonLedgerLine.sku,
+    facility_id=CarbonLedgerLine.facility_id,
+    kg_co2e=CarbonLedgerLine.kg_co2e,
+    confidence=CarbonLedgerLine.confidence,
+    computed_at=CarbonLedgerLine.computed_at,
+)
+
+ROLLUP = AggSource(
+    name="rollup",
+    table=CarbonDailyRollup,
+    period_date=CarbonDailyRollup.period_date,
+    scope=CarbonDailyRollup.scope,
+    category=CarbonDailyRollup.category,
+    activity_type=CarbonDailyRollup.activity_type,
+    supplier_id=CarbonDailyRollup.supplier_id,
+    lane_id=CarbonDailyRollup.lane_id,
+    sku=CarbonDailyRollup.sku,
+    facility_id=CarbonDailyRollup.facility_id,
+    kg_co2e=CarbonDailyRollup.kg_co2e_sum,
+    confidence=CarbonDailyRollup.confidence_sum,
+    computed_at=CarbonDailyRollup.last_computed_at,
+    count_col=CarbonDailyRollup.activity_count,
+)
+
+_rollup_ready = False
+
+
+def aggregate_source(db: Session) -> AggSource:
+    # Pick the rollup whenever it is enabled and its triggers are installed; the
+    # positive check is cached since triggers are only ever (re)installed, not removed.
+    global _rollup_ready
+    if not settings.ledger_rollup_enabled:
+        return LEDGER
+    if not _rollup_ready:
+        _rollup_ready = rollup_installed(db.connection())
+    return ROLLUP if _rollup_ready else LEDGER
+
+
+async def aggregate_source_async(session: AsyncSession) -> AggSource:
+    if settings.ledger_rollup_enabled and not _rollup_ready:
+        # One-time catalog check; afterwards this never touches the database.
+        return await session.run_sync(aggregate_source)
+    return ROLLUP if _rollup_ready else LEDGER
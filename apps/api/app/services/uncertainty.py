@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.core.config import settings
+
+# Monte Carlo uncertainty for scenario deltas. Every scenario's carbon delta is a
+# coefficient times the ledger carbon of the lines it touches (mode_shift: ef_ratio - 1
+# over the shifted shipments, distance_reduction: -pct over all of them, ...), so draws
+# only need per-method sufficient statistics of those lines, not the lines themselves:
+#
+#   X_m = S_m * F_m + sqrt(Q_m) * sigma_activity_m * Z_m
+#
+# with S_m / Q_m the sum / sum of squares of kg over lines computed by method m. F_m is a
+# lognormal (mean 1) emission-factor error shared by every line of the method, since a
+# wrong factor is wrong for all of them; the activity-data term is independent per line,
+# summed by the CLT. A draw is then O(methods), whatever the number of shipments.
+
+# (factor sigma, activity-data sigma), relative. Methods not listed fall back to
+# 1 - mean confidence of their lines for both.
+METHOD_SIGMAS: dict[str, tuple[float, float]] = {
+    "activity_factor": (0.10, 0.05),
+    "fallback_proxy": (0.35, 0.20),
+}
+
+# Draws per task. Fixed so a seed gives the same result serially and on the pool.
+_CHUNK = 100_000
+
+
+@dataclass(frozen=True)
+class MethodStats:
+    method: str
+    kg: float
+    kg_sq: float
+    lines: int
+    confidence: float  # mean over the lines
+
+
+def method_stats(kg: np.ndarray, codes: np.ndarray, names: tuple[str, ...], confidence: np.ndarray) -> list[MethodStats]:
+    """Per-method sums over lines given as parallel arrays (codes index into names)."""
+    n = len(names)
+    sums = np.bincount(codes, weights=kg, minlength=n)
+    sq = np.bincount(codes, weights=kg * kg, minlength=n)
+    lines = np.bincount(codes, minlength=n)
+    conf = np.bincount(codes, weights=confidence, minlength=n)
+    return [
+        MethodStats(names[i], float(sums[i]), float(sq[i]), int(lines[i]), float(conf[i] / lines[i]))
+        for i in range(n)
+        if lines[i]
+    ]
+
+
+def resolve_sigmas(stats: list[MethodStats], overrides: dict) -> dict[str, tuple[float, float]]:
+    out = {}
+    for s in stats:
+        default = METHOD_SIGMAS.get(s.method)
+        if default is None:
+            fallback = min(max(1.0 - s.confidence, 0.0), 1.0)
+            default = (fallback, fallback)
+        o = overrides.get(s.method, {})
+        factor = float(o.get("factor", default[0]))
+        activity = float(o.get("activity", default[1]))
+        if factor < 0 or activity < 0:
+            raise ValueError("Uncertainty sigmas must be non-negative")
+        out[s.method] = (factor, activity)
+    return out
+
+
+def _draw_chunk(kg: np.ndarray, kg_sd: np.ndarray, factor_sigma: np.ndarray, n: int, seed: np.random.SeedSequence) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    m = len(kg)
+    factor = rng.lognormal(-0.5 * factor_sigma**2, factor_sigma, size=(n, m))
+    activity = rng.standard_normal((n, m))
+    return factor @ kg + activity @ kg_sd
+
+
+def _warm() -> None:
+    pass
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def start_pool() -> None:
+    """Start the draw workers (API startup). Spawned, not forked: the server already runs
+    background threads and holds pooled DB connections that a fork would copy mid-use.
+    Workers only import this module and NumPy."""
+    global _pool
+    with _pool_lock:
+        if _pool is None and settings.scenario_mc_workers > 1:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.scenario_mc_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            # Executors start workers on demand; start them (and their imports) now rather
+            # than on the first request that needs them.
+            for _ in range(settings.scenario_mc_workers):
+                _pool.submit(_warm)
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def sample_carbon(stats: list[MethodStats], sigmas: dict[str, tuple[float, float]], samples: int, seed: int) -> np.ndarray:
+    """`samples` draws of the total carbon of the lines summarised by `stats`."""
+    if not stats:
+        return np.zeros(samples)
+    kg = np.array([s.kg for s in stats])
+    kg_sd = np.sqrt([s.kg_sq for s in stats]) * np.array([sigmas[s.method][1] for s in stats])
+    factor_sigma = np.array([sigmas[s.method][0] for s in stats])
+
+    sizes = [min(_CHUNK, samples - i) for i in range(0, samples, _CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    pool = _pool
+    if len(sizes) > 1 and pool is not None:
+        futures = [pool.submit(_draw_chunk, kg, kg_sd, factor_sigma, n, s) for n, s in zip(sizes, seeds)]
+        return np.concatenate([f.result() for f in futures])
+    return np.concatenate([_draw_chunk(kg, kg_sd, factor_sigma, n, s) for n, s in zip(sizes, seeds)])
+
+
+def delta_uncertainty(stats: list[MethodStats], coef: float, options: dict) -> dict:
+    """P5/P50/P95 of coef * (carbon of the impacted lines), plus the inputs used."""
+    samples = int(options.get("samples", 10_000))
+    if not 1 <= samples <= settings.scenario_mc_max_samples:
+        raise ValueError(f"uncertainty.samples must be between 1 and {settings.scenario_mc_max_samples}")
+    seed = int(options.get("seed", 0))
+    sigmas = resolve_sigmas(stats, options.get("sigmas", {}))
+
+    deltas = coef * sample_carbon(stats, sigmas, samples, seed)
+    p5, p50, p95 = np.percentile(deltas, [5, 50, 95])
+    return {
+        "samples": samples,
+        "seed": seed,
+        "delta_carbon_kg": {"p5": float(p5), "p50": float(p50), "p95": float(p95)},
+        "by_method": [
+            {
+                "method": s.method,
+                "kg_co2e": s.kg,
+                "lines": s.lines,
+                "mean_confidence": s.confidence,
+                "factor_sigma": sigmas[s.method][0],
+                "activity_sigma": sigmas[s.method][1],
+            }
+            for s in stats
+        ],
+    }
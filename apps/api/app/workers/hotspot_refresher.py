@@ -0,0 +1,58 @@
+"""Keep hotspot_aggregates current for the standard windows.
+
+Runs inside the API process (started on app startup when
+HOTSPOT_REFRESH_INTERVAL_SECONDS > 0) or standalone:
+
+    python -m app.workers.hotspot_refresher [--once] [--interval 60]
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import threading
+
+from app.core.config import settings
+from app.db.engine import SessionLocal
+from app.services.hotspot_refresh import refresh_hotspots
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_once() -> dict:
+    with SessionLocal() as db:
+        return refresh_hotspots(db)
+
+
+def run_forever(interval_seconds: float, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            refresh_once()
+        except Exception:
+            # Keep the loop alive across transient DB errors; the next tick retries.
+            logger.exception("hotspot refresh failed")
+        stop.wait(interval_seconds)
+
+
+def start_in_process(interval_seconds: float) -> threading.Event:
+    stop = threading.Event()
+    threading.Thread(
+        target=run_forever, args=(interval_seconds, stop), name="hotspot-refresher", daemon=True
+    ).start()
+    return stop
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--once", action="store_true", help="refresh once and exit")
+    ap.add_argument("--interval", type=float, default=settings.hotspot_refresh_interval_seconds or 60)
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.once:
+        print(refresh_once())
+        return
+    run_forever(args.interval, threading.Event())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Maintain carbon_ledger's monthly partitions (settings.ledger_partitioned).
+
+Runs inside the API process (hourly, started on app startup when
+LEDGER_PARTITIONED=true) or standalone:
+
+    python -m app.workers.ledger_partitions [--once] [--interval 3600]
+    python -m app.workers.ledger_partitions --detach 2024-01 [--drop]
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import logging
+import threading
+
+from app.core.config import settings
+from app.db.engine import engine
+from app.db.partitions import detach_ledger_partition, ensure_ledger_partitions
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_INTERVAL_SECONDS = 3600
+
+
+def maintain_once() -> list[str]:
+    with engine.begin() as conn:
+        created = ensure_ledger_partitions(conn, settings.ledger_partition_months_ahead)
+    if created:
+        logger.info("created ledger partitions: %s", ", ".join(created))
+    return created
+
+
+def run_forever(interval_seconds: float, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            maintain_once()
+        except Exception:
+            logger.exception("ledger partition maintenance failed")
+        stop.wait(interval_seconds)
+
+
+def start_in_process(interval_seconds: float = MAINTENANCE_INTERVAL_SECONDS) -> threading.Event:
+    stop = threading.Event()
+    threading.Thread(
+        target=run_forever, args=(interval_seconds, stop), name="ledger-partitions", daemon=True
+    ).start()
+    return stop
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--once", action="store_true", help="create missing partitions and exit")
+    ap.add_argument("--interval", type=float, default=MAINTENANCE_INTERVAL_SECONDS)
+    ap.add_argument("--detach", metavar="YYYY-MM", help="detach one month and exit")
+    ap.add_argument("--drop", action="store_true", help="with --detach, drop the detached table")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.detach:
+        month = dt.date.fromisoformat(args.detach + "-01")
+        with engine.begin() as conn:
+            print(detach_ledger_partition(conn, month, drop=args.drop))
+        return
+    if args.once:
+        print(maintain_once())
+        return
+    run_forever(args.interval, threading.Event())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark: API throughput under concurrent clients, sync (threadpool) vs async DB path.
+
+Starts a uvicorn server per mode (API_BENCH_ASYNC_DB=0 / 1, response cache off so every
+request hits the database) and drives it with N concurrent httpx clients over the hot
+paths that have native async variants: summary, hotspots, simulate and report.
+
+Run from apps/api against a scratch database:
+
+    DATABASE_URL=postgresql+psycopg://... python -m scripts.bench_api_concurrency --clients 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def _start_server(port: int, db_async: bool) -> subprocess.Popen:
+    env = dict(os.environ, API_BENCH_ASYNC_DB="1" if db_async else "0", RESPONSE_CACHE_ENABLED="false")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+
+
+def _wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not become ready")
+
+
+# (method, path, JSON body) per request kind.
+Request = tuple[str, str, dict | None]
+
+
+async def _run_clients(base_url: str, reqs: list[Request], clients: int, requests_per_client: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+
+        async def _client(i: int) -> None:
+            nonlocal errors
+            for j in range(requests_per_client):
+                method, path, body = reqs[(i + j) % len(reqs)]
+                t0 = time.perf_counter()
+                try:
+                    r = await client.request(method, path, json=body)
+                    if r.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(_client(i) for i in range(clients)))
+        elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+        "p99_ms": latencies[int(0.99 * (len(latencies) - 1))],
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--clients", type=int, default=200)
+    ap.add_argument("--requests", type=int, default=10, help="requests per client")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--modes", default="sync,async")
+    ap.add_argument("--from", dest="from_", default="2024-04-01")
+    ap.add_argument("--to", default="2025-03-31")
+    args = ap.parse_args()
+
+    window = f"from={args.from_}&to={args.to}"
+    time_window = {"from": args.from_, "to": args.to}
+    reqs: list[Request] = [
+        ("GET", f"/carbon/summary?{window}", None),
+        ("GET", f"/hotspots?dimension=lane&{window}", None),
+        ("GET", f"/hotspots?dimension=supplier&{window}", None),
+        (
+            "POST",
+            "/simulate",
+            {
+                "time_window": time_window,
+                "scenario_type": "mode_shift",
+                "parameters": {"from_mode": "road", "to_mode": "rail", "percentage": 20},
+            },
+        ),
+        ("POST", "/report/generate", {"time_window": time_window}),
+    ]
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    for mode in args.modes.split(","):
+        proc = _start_server(args.port, db_async=(mode == "async"))
+        try:
+            _wait_ready(base_url)
+            asyncio.run(_run_clients(base_url, reqs, min(args.clients, 10), 1))  # warm-up
+            r = asyncio.run(_run_clients(base_url, reqs, args.clients, args.requests))
+        finally:
+            proc.terminate()
+            proc.wait()
+        print(
+            f"{mode:<6} clients={args.clients:<4} requests={r['requests']:<6} errors={r['errors']:<4} "
+            f"{r['rps']:8.1f} req/s  p50={r['p50_ms']:8.1f} ms  p95={r['p95_ms']:8.1f} ms  p99={r['p99_ms']:8.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Benchmark: five-query carbon_summary vs the single-scan summary engine.
+
+Run from apps/api against a scratch database:
+
+    DATABASE_URL=postgresql+psycopg://... python -m scripts.bench_carbon_summary --seed --rows 2000000
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import statistics
+import time
+
+from sqlalchemy import event, func, select, text
+
+from app.db.engine import SessionLocal, engine
+from app.db.init_db import init_db
+from app.db.models import CarbonLedgerLine
+from app.services import carbon as carbon_svc
+
+BENCH_PREFIX = "bench:"
+
+
+def seed_ledger(rows: int, days: int) -> None:
+    # Server-side generate_series keeps seeding fast and independent of client memory.
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                """
+                INSERT INTO carbon_ledger (
+                    ledger_id, activity_id, activity_type, scope, category, kg_co2e, method, confidence,
+                    factor_key, factor_version, lineage_json, assumptions_json, computed_at, period_date,
+                    supplier_id, lane_id, sku, facility_id
+                )
+                SELECT
+                    :prefix || g,
+                    'BENCH_' || g,
+                    (ARRAY['shipment', 'purchased_goods', 'electricity_bill'])[1 + g % 3],
+                    CASE WHEN g % 3 = 2 THEN 2 ELSE 3 END,
+                    (ARRAY['transport', 'purchased_goods', 'electricity'])[1 + g % 3],
+                    (g % 997) * 1.7,
+                    CASE WHEN g % 7 = 0 THEN 'fallback_proxy' ELSE 'activity_factor' END,
+                    CASE WHEN g % 7 = 0 THEN 0.4 ELSE 0.85 END,
+                    NULL,
+                    NULL,
+                    '{}'::jsonb,
+                    '{"notes": []}'::jsonb,
+                    now() - (g % 86400) * interval '1 second',
+                    DATE '2024-04-01' + (g % :days),
+                    NULL,
+                    'LANE_BENCH_' || (g % 500),
+                    'SKU_BENCH_' || (g % 5000),
+                    'FAC_BENCH_' || (g % 20)
+                FROM generate_series(1, :rows) AS g
+                """
+            ),
+            {"prefix": BENCH_PREFIX, "rows": rows, "days": days},
+        )
+        conn.execute(text("ANALYZE carbon_ledger"))
+
+
+def cleanup_ledger() -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM carbon_ledger WHERE ledger_id LIKE :p"), {"p": BENCH_PREFIX + "%"})
+
+
+def legacy_carbon_summary(db, from_date: dt.date, to_date: dt.date) -> dict:
+    # The pre-engine implementation: five independent range scans.
+    rng = (CarbonLedgerLine.period_date >= from_date, CarbonLedgerLine.period_date <= to_date)
+    total, last_computed_at = db.execute(
+        select(func.sum(CarbonLedgerLine.kg_co2e), func.max(CarbonLedgerLine.computed_at)).where(*rng)
+    ).one()
+    scope_rows = db.execute(
+        select(CarbonLedgerLine.scope, func.sum(CarbonLedgerLine.kg_co2e)).where(*rng).group_by(CarbonLedgerLine.scope)
+    ).all()
+    cat_rows = db.execute(
+        select(CarbonLedgerLine.category, func.sum(CarbonLedgerLine.kg_co2e))
+        .where(*rng)
+        .group_by(CarbonLedgerLine.category)
+    ).all()
+    daily_rows = db.execute(
+        select(CarbonLedgerLine.period_date, func.sum(CarbonLedgerLine.kg_co2e))
+        .where(*rng)
+        .group_by(CarbonLedgerLine.period_date)
+        .order_by(CarbonLedgerLine.period_date.asc())
+    ).all()
+    conf = db.execute(select(func.count(), func.avg(CarbonLedgerLine.confidence)).where(*rng)).one()
+    return {
+        "total_kg_co2e": float(total or 0.0),
+        "scope_split": {str(s): float(v or 0.0) for s, v in scope_rows},
+        "category_split": {str(c): float(v or 0.0) for c, v in cat_rows},
+        "trend_daily": [{"date": d.isoformat(), "kg_co2e": float(v or 0.0)} for d, v in daily_rows],
+        "activity_count": int(conf[0] or 0),
+        "last_computed_at": last_computed_at,
+    }
+
+
+def _measure(fn, from_date: dt.date, to_date: dt.date, repeats: int) -> tuple[list[float], int]:
+    statements = 0
+
+    def _count(*_args, **_kwargs) -> None:
+        nonlocal statements
+        statements += 1
+
+    timings = []
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        with SessionLocal() as db:
+            fn(db, from_date, to_date)  # warm-up (plans, buffer cache)
+            statements = 0
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                fn(db, from_date, to_date)
+                timings.append((time.perf_counter() - t0) * 1000.0)
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+    return timings, statements // repeats
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--seed", action="store_true", help="insert a synthetic ledger before benchmarking")
+    ap.add_argument("--cleanup", action="store_true", help="delete the synthetic ledger afterwards")
+    ap.add_argument("--rows", type=int, default=2_000_000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--from", dest="from_", default="2024-04-01")
+    ap.add_argument("--to", default="2025-03-31")
+    args = ap.parse_args()
+
+    init_db(load_seed=False)
+    if args.seed:
+        t0 = time.perf_counter()
+        seed_ledger(args.rows, args.days)
+        print(f"seeded {args.rows} ledger rows in {time.perf_counter() - t0:.1f}s")
+
+    from_date = carbon_svc.parse_date(args.from_)
+    to_date = carbon_svc.parse_date(args.to)
+
+    try:
+        results = {}
+        for name, fn in (("legacy (5 queries)", legacy_carbon_summary), ("engine", carbon_svc.carbon_summary)):
+            timings, statements = _measure(fn, from_date, to_date, args.repeats)
+            results[name] = timings
+            print(
+                f"{name:<20} statements/call={statements:<3} "
+                f"median={statistics.median(timings):9.1f} ms  min={min(timings):9.1f} ms"
+            )
+        legacy = statistics.median(results["legacy (5 queries)"])
+        new = statistics.median(results["engine"])
+        print(f"speedup: {legacy / new:.2f}x" if new > 0 else "speedup: n/a")
+    finally:
+        if args.cleanup:
+            cleanup_ledger()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark: streaming ledger export throughput and peak Python memory per format.
+
+Run from apps/api against a scratch database:
+
+    DATABASE_URL=postgresql+psycopg://... python -m scripts.bench_ledger_export --seed --rows 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+
+from sqlalchemy import func, select
+
+from app.db.engine import SessionLocal
+from app.db.init_db import init_db
+from app.services import carbon as carbon_svc
+from app.services import export as export_svc
+from scripts.bench_carbon_summary import cleanup_ledger, seed_ledger
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--seed", action="store_true", help="insert a synthetic ledger before benchmarking")
+    ap.add_argument("--cleanup", action="store_true", help="delete the synthetic ledger afterwards")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--batch-size", type=int, default=5000)
+    ap.add_argument("--formats", default="ndjson,csv,arrow")
+    ap.add_argument("--trace-memory", action="store_true", help="report peak Python heap (slows the export)")
+    ap.add_argument("--from", dest="from_", default="2024-04-01")
+    ap.add_argument("--to", default="2025-03-31")
+    args = ap.parse_args()
+
+    init_db(load_seed=False)
+    if args.seed:
+        seed_ledger(args.rows, args.days)
+
+    from_date = carbon_svc.parse_date(args.from_)
+    to_date = carbon_svc.parse_date(args.to)
+
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(func.count()).select_from(export_svc._export_query(from_date, to_date, None, None).subquery())
+        ).scalar_one()
+
+    try:
+        for fmt in args.formats.split(","):
+            if args.trace_memory:
+                tracemalloc.start()
+            t0 = time.perf_counter()
+            n_bytes = 0
+            for chunk in export_svc.export_ledger(fmt, from_date, to_date, None, None, batch_size=args.batch_size):
+                n_bytes += len(chunk)
+            elapsed = time.perf_counter() - t0
+            line = f"{fmt:<7} rows={rows:<9} {elapsed:7.2f} s  {rows / elapsed if elapsed else 0:10.0f} rows/s  {n_bytes / 1e6:9.1f} MB"
+            if args.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                line += f"  peak_py_mem={peak / 1e6:6.1f} MB"
+            print(line)
+    finally:
+        if args.cleanup:
+            cleanup_ledger()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""EXPLAIN ANALYZE the ledger-reading service queries under the legacy and the new index layout.
+
+Runs each service against the raw ledger (rollup bypassed), captures the SQL it sends,
+and explains every statement twice: with the old single-column indexes, then after
+app.db.indexes.migrate_ledger_indexes(). Everything happens in one transaction that is
+rolled back unless --apply is given. The DDL takes exclusive locks on carbon_ledger, so
+point it at a scratch or staging database. Run from apps/api:
+
+    DATABASE_URL=postgresql+psycopg://... python -m scripts.explain_ledger_indexes [--apply]
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.engine import engine
+from app.db.indexes import migrate_ledger_indexes, restore_legacy_ledger_indexes
+from app.services import carbon as carbon_svc
+from app.services import cube as cube_svc
+from app.services import hotspot_refresh as hotspot_refresh_svc
+
+
+def _workload(db: Session, from_date: dt.date, to_date: dt.date) -> None:
+    carbon_svc.carbon_summary(db, from_date, to_date)
+    page = carbon_svc.list_ledger(db, from_date, to_date, None, None, 200, 0, include_total=False)
+    if page.get("next_cursor"):
+        carbon_svc.list_ledger(db, from_date, to_date, None, None, 200, 0, cursor=page["next_cursor"], include_total=False)
+    for dimension in carbon_svc.HOTSPOT_DIMENSIONS:
+        top = carbon_svc.compute_hotspots(db, dimension, from_date, to_date, 10)
+        if top:
+            top_activities = metrics.traced("hotspot_detail")(hotspot_refresh_svc._top_activities)
+            top_activities(db, dimension, top[0]["key"], from_date, to_date, 10)
+    cube_svc.carbon_cube(db, ["lane"], "month", from_date, to_date)
+
+
+def _capture(conn, from_date: dt.date, to_date: dt.date) -> list[tuple[str, str, dict]]:
+    captured: list[tuple[str, str, dict]] = []
+
+    def _before(_conn, _cursor, statement, parameters, _context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((metrics._current_service.get(), statement, parameters))
+
+    event.listen(conn, "before_cursor_execute", _before)
+    try:
+        _workload(Session(bind=conn), from_date, to_date)
+    finally:
+        event.remove(conn, "before_cursor_execute", _before)
+    return captured
+
+
+def _explain(conn, statement: str, parameters) -> dict:
+    plan = conn.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters).scalar_one()
+    plan = plan[0] if isinstance(plan, list) else json.loads(plan)[0]
+    root = plan["Plan"]
+
+    def _scans(node: dict) -> list[str]:
+        found = [f"{node['Node Type']}({node['Index Name']})"] if "Index Name" in node else []
+        if node["Node Type"] == "Seq Scan":
+            found.append(f"Seq Scan({node['Relation Name']})")
+        for child in node.get("Plans", []):
+            found.extend(_scans(child))
+        return found
+
+    return {
+        "ms": plan["Execution Time"],
+        "buffers": root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0),
+        "scans": sorted(set(_scans(root))),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--from", dest="from_", default="2025-01-01")
+    ap.add_argument("--to", default="2025-03-31")
+    ap.add_argument("--apply", action="store_true", help="commit the migrated index layout")
+    args = ap.parse_args()
+
+    from_date = carbon_svc.parse_date(args.from_)
+    to_date = carbon_svc.parse_date(args.to)
+    settings.ledger_rollup_enabled = False
+
+    with engine.connect() as conn:
+        trans = conn.begin()
+        restore_legacy_ledger_indexes(conn)
+        conn.execute(text("ANALYZE carbon_ledger"))
+        queries = _capture(conn, from_date, to_date)
+        before = [_explain(conn, stmt, params) for _, stmt, params in queries]
+
+        changes = migrate_ledger_indexes(conn)
+        conn.execute(text("ANALYZE carbon_ledger"))
+        after = [_explain(conn, stmt, params) for _, stmt, params in queries]
+
+        print(f"created: {', '.join(changes['created']) or '-'}")
+        print(f"dropped: {', '.join(changes['dropped']) or '-'}\n")
+        print(f"{'service':<22} {'before ms':>10} {'after ms':>10} {'buf before':>11} {'buf after':>10}  scans after")
+        for (service, _, _), b, a in zip(queries, before, after):
+            print(
+                f"{service:<22} {b['ms']:>10.2f} {a['ms']:>10.2f} {b['buffers']:>11} {a['buffers']:>10}  "
+                f"{', '.join(a['scans']) or '-'}"
+            )
+        print(f"{'total':<22} {sum(b['ms'] for b in before):>10.2f} {sum(a['ms'] for a in after):>10.2f}")
+
+        if args.apply:
+            trans.commit()
+            print("\napplied")
+        else:
+            trans.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""Maintenance: compact inline assumptions documents of settled ledger months into ledger_payloads.
+
+Each month is one transaction that blocks ledger writes (including the Pathway worker)
+until it commits, so run it in a quiet window. Months from --before on are left inline
+because the pipeline may still rewrite them. Safe to re-run. Run from apps/api:
+
+    DATABASE_URL=postgresql+psycopg://... python -m scripts.intern_ledger_payloads [--before 2025-01-01]
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import time
+
+from app.db.engine import engine
+from app.db.payloads import intern_ledger_payloads
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--before", help="first period_date left inline (default: start of the current month)")
+    args = ap.parse_args()
+
+    before = dt.date.fromisoformat(args.before) if args.before else dt.date.today().replace(day=1)
+    t0 = time.perf_counter()
+    rows = intern_ledger_payloads(engine, before)
+    print(f"interned {rows} rows dated before {before.isoformat()} in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
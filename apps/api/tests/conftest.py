@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+
+from app.db.engine import engine
+
+
+@pytest.fixture(scope="session")
+def pg_schema() -> None:
+    # Database tests run against DATABASE_URL (a scratch Postgres) and are skipped
+    # without one. init_db is idempotent; seed files aren't loaded.
+    if engine.dialect.name != "postgresql":
+        pytest.skip("needs a Postgres DATABASE_URL")
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except OperationalError as e:
+        pytest.skip(f"database unavailable: {e.orig}")
+    from app.db.init_db import init_db
+
+    init_db(load_seed=False)
+
+
+@pytest.fixture
+def pg_conn(pg_schema) -> Iterator[Connection]:
+    # Everything a test writes, trigger-maintained tables included, is rolled back.
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            yield conn
+        finally:
+            trans.rollback()
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.db.rollup import ROLLUP_KEY, install_rollup
+
+# Test rows live in 2099 so the checks only see them, whatever else the database holds.
+_PARITY = f"""
+WITH l AS (
+    SELECT {ROLLUP_KEY}, round(sum(kg_co2e)::numeric, 6), count(*), round(sum(confidence)::numeric, 6), max(computed_at)
+    FROM carbon_ledger WHERE period_date >= date '2099-01-01' GROUP BY {ROLLUP_KEY}
+), r AS (
+    SELECT {ROLLUP_KEY}, round(kg_co2e_sum::numeric, 6), activity_count, round(confidence_sum::numeric, 6), last_computed_at
+    FROM carbon_daily_rollup WHERE period_date >= date '2099-01-01'
+)
+SELECT (SELECT count(*) FROM (SELECT * FROM l EXCEPT SELECT * FROM r) AS missing)
+     + (SELECT count(*) FROM (SELECT * FROM r EXCEPT SELECT * FROM l) AS extra)
+"""
+
+_INSERT = """
+INSERT INTO carbon_ledger (
+    ledger_id, activity_id, activity_type, scope, category, kg_co2e, method, confidence,
+    lineage_json, assumptions_json, computed_at, period_date, lane_id, facility_id
+)
+SELECT 'test:' || g, 'T' || g, 'shipment', 3, 'transport', g * 1.5, 'activity_factor', 0.8,
+       '{}', '{"notes": []}', timestamptz '2099-02-01' - g * interval '1 hour',
+       date '2099-01-01' + g % 5, 'LANE_' || g % 3, CASE WHEN g % 4 = 0 THEN NULL ELSE 'F1' END
+FROM generate_series(1, :n) AS g
+"""
+
+
+def _mismatches(conn: Connection) -> int:
+    return conn.execute(text(_PARITY)).scalar_one()
+
+
+def _seed(conn: Connection, n: int = 60) -> None:
+    install_rollup(conn)
+    conn.execute(text(_INSERT), {"n": n})
+
+
+def test_rollup_matches_ledger_after_insert(pg_conn):
+    _seed(pg_conn)
+    assert _mismatches(pg_conn) == 0
+    assert pg_conn.execute(text("SELECT count(*) FROM carbon_daily_rollup WHERE period_date >= '2099-01-01'")).scalar_one()
+
+
+def test_rollup_matches_ledger_after_update(pg_conn):
+    _seed(pg_conn)
+    # Measures change, computed_at moves both ways, and some rows change rollup key.
+    pg_conn.execute(text("UPDATE carbon_ledger SET kg_co2e = kg_co2e * 2 WHERE ledger_id LIKE 'test:%' AND right(ledger_id, 1) = '1'"))
+    pg_conn.execute(
+        text("UPDATE carbon_ledger SET computed_at = computed_at - interval '3 days' WHERE ledger_id IN ('test:1', 'test:5', 'test:10')")
+    )
+    pg_conn.execute(text("UPDATE carbon_ledger SET computed_at = timestamptz '2099-03-01' WHERE ledger_id = 'test:7'"))
+    pg_conn.execute(
+        text("UPDATE carbon_ledger SET period_date = period_date + 7, lane_id = 'LANE_X' WHERE ledger_id LIKE 'test:2%'")
+    )
+    assert _mismatches(pg_conn) == 0
+
+
+def test_rollup_matches_ledger_after_delete(pg_conn):
+    _seed(pg_conn)
+    # Deleting each group's newest row must lower last_computed_at; deleting every row
+    # of a group must remove it.
+    pg_conn.execute(text("DELETE FROM carbon_ledger WHERE ledger_id IN ('test:1', 'test:2', 'test:3')"))
+    pg_conn.execute(text("DELETE FROM carbon_ledger WHERE ledger_id LIKE 'test:%' AND lane_id = 'LANE_1'"))
+    assert _mismatches(pg_conn) == 0
+    pg_conn.execute(text("DELETE FROM carbon_ledger WHERE ledger_id LIKE 'test:%'"))
+    assert _mismatches(pg_conn) == 0
+    assert not pg_conn.execute(text("SELECT count(*) FROM carbon_daily_rollup WHERE period_date >= '2099-01-01'")).scalar_one()
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.services.scenario import _evaluate, _new_scenario_data, _snapshot, parse_date
+
+# (shipment_id, mode, ton_km, kg_co2e, method, confidence): one row per (shipment,
+# method), ordered by shipment, as _shipments_query returns them.
+ROWS = [
+    ("S1", "road", 100.0, 12.0, "activity_factor", 0.85),
+    ("S2", "road", 200.0, 20.0, "activity_factor", 0.85),
+    ("S2", "road", 200.0, 4.0, "fallback_proxy", 0.40),
+    ("S3", "rail", 300.0, 12.0, "activity_factor", 0.85),
+    ("S4", "road", 50.0, 0.0, None, 0.0),
+]
+
+
+def _data():
+    return _new_scenario_data(parse_date("2025-01-01"), parse_date("2025-12-31"), {}, _snapshot(ROWS))
+
+
+def _mode_shift(pct: float, cost_model: dict | None = None) -> dict:
+    return {
+        "time_window": {"from": "2025-01-01", "to": "2025-12-31"},
+        "scenario_type": "mode_shift",
+        "parameters": {"from_mode": "road", "to_mode": "rail", "percentage": pct},
+        "cost_model": cost_model or {},
+    }
+
+
+def test_snapshot_has_one_entry_per_shipment():
+    s = _snapshot(ROWS)
+    assert list(s.shipment_id) == ["S1", "S2", "S3", "S4"]
+    assert s.kg_co2e.tolist() == [12.0, 24.0, 12.0, 0.0]
+    assert s.ton_km.tolist() == [100.0, 200.0, 300.0, 50.0]
+
+
+def test_mode_shift_costs_baseline_and_scenario_separately():
+    data = _data()
+    modes_before = data.shipments.mode.copy()
+    costs = {"road_cost_per_tkm": 2.0, "rail_cost_per_tkm": 0.5}
+    res = _evaluate(data, _mode_shift(100.0, costs))
+
+    assert res["baseline_cost"] == pytest.approx(2.0 * 350 + 0.5 * 300)
+    assert res["scenario_cost"] == pytest.approx(0.5 * 650)
+    assert res["baseline_cost"] != res["scenario_cost"]
+    # The shared snapshot is never mutated, so later variants see the same baseline.
+    np.testing.assert_array_equal(data.shipments.mode, modes_before)
+    assert _evaluate(data, _mode_shift(0.0, costs))["baseline_cost"] == res["baseline_cost"]
+
+
+def test_mode_shift_carbon_uses_shifted_shipments_only():
+    res = _evaluate(_data(), _mode_shift(50.0))
+    # Half of the three road shipments rounds to two: S1 and S2 (36 kg) at the rail/road EF ratio.
+    assert res["impacted_activity_count"] == 2
+    assert res["baseline_carbon_kg"] == pytest.approx(48.0)
+    assert res["scenario_carbon_kg"] == pytest.approx(48.0 - 36.0 + 36.0 * 0.04 / 0.12)
+
+
+def test_method_stats_keep_each_method():
+    s = _snapshot(ROWS)
+    by_method = {m.method: m for m in s.method_stats(np.array([1]))}
+    assert by_method["activity_factor"].kg == pytest.approx(20.0)
+    assert by_method["fallback_proxy"].kg == pytest.approx(4.0)
+    assert sum(m.kg for m in s.method_stats()) == pytest.approx(48.0)
@@ -305,7 +305,7 @@ def build_pipeline(cfg: WorkerConfig) -> None:
             "carbon_ledger",
             output_table_type="snapshot",
             init_mode="create_if_not_exists",
-            primary_key=[ledger.ledger_id],
+            primary_key=[ledger.ledger_id, ledger.period_date] if cfg.ledger_partitioned else [ledger.ledger_id],
         )
     except Exception as e:
         # Fallback: write stream of changes to CSV outputs for demo debugging.